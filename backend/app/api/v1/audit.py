@@ -1,41 +1,73 @@
 from datetime import datetime
+from itertools import islice
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
-import io
 
 from app.database import get_db
 from app.dependencies import require_admin
 from app.models.user import User
 from app.models.audit_log import AuditLog
-from app.schemas.audit import AuditLogResponse, AuditFlagUpdate
+from app.schemas.audit import AuditLogResponse, AuditLogPage, AuditFlagUpdate
 from app.services.audit_service import AuditService
+from app.services.audit_partitions import archived_months, read_archived
+from app.utils.excel_stream import write_only_workbook, xlsx_response, ROWS_PER_BATCH
+from app.utils.text_stream import export_response
+from app.utils.pagination import encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/audit", tags=["Audit"])
 
 
-@router.get("", response_model=list[AuditLogResponse])
-def get_audit_logs(
+def audit_filters(
     entity_type: str | None = None,
     entity_id: int | None = None,
     user_id: int | None = None,
+    user_name: str | None = None,
     action: str | None = None,
     is_flagged: bool | None = None,
     start_date: datetime | None = None,
     end_date: datetime | None = None,
-    limit: int = 100,
-    offset: int = 0,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_admin),
+    details_bar_id: int | None = Query(None, alias="details.bar_id"),
+    details_station_id: int | None = Query(None, alias="details.station_id"),
+) -> dict:
+    """Filtros comunes de las consultas de auditoria (BD y archivos)."""
+    return {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "user_id": user_id,
+        "user_name": user_name,
+        "action": action,
+        "is_flagged": is_flagged,
+        "start_date": start_date,
+        "end_date": end_date,
+        "details_bar_id": details_bar_id,
+        "details_station_id": details_station_id,
+    }
+
+
+def _filter_audit_query(
+    query,
+    entity_type: str | None = None,
+    entity_id: int | None = None,
+    user_id: int | None = None,
+    user_name: str | None = None,
+    action: str | None = None,
+    is_flagged: bool | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    details_bar_id: int | None = None,
+    details_station_id: int | None = None,
 ):
-    query = db.query(AuditLog)
     if entity_type:
         query = query.filter(AuditLog.entity_type == entity_type)
     if entity_id:
         query = query.filter(AuditLog.entity_id == entity_id)
     if user_id:
         query = query.filter(AuditLog.user_id == user_id)
+    # ILIKE '%...%' usa los indices trigram de action y user_name
+    if user_name:
+        query = query.filter(AuditLog.user_name.ilike(f"%{user_name}%"))
     if action:
         query = query.filter(AuditLog.action.ilike(f"%{action}%"))
     if is_flagged is not None:
@@ -44,14 +76,81 @@ def get_audit_logs(
         query = query.filter(AuditLog.action_date >= start_date)
     if end_date:
         query = query.filter(AuditLog.action_date <= end_date)
+    # details @> {...} usa el indice GIN de details
+    if details_bar_id is not None:
+        query = query.filter(AuditLog.details.contains({"bar_id": details_bar_id}))
+    if details_station_id is not None:
+        query = query.filter(AuditLog.details.contains({"station_id": details_station_id}))
+    return query
+
 
-    return (
+@router.get("", response_model=list[AuditLogResponse])
+def get_audit_logs(
+    filters: dict = Depends(audit_filters),
+    limit: int = 100,
+    offset: int = 0,
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+):
+    query = _filter_audit_query(db.query(AuditLog), **filters)
+    rows = (
         query.order_by(AuditLog.action_date.desc())
         .offset(offset)
         .limit(limit)
         .all()
     )
 
+    # Si el rango alcanza meses archivados, se completa la pagina desde los archivos
+    start_date, end_date = filters["start_date"], filters["end_date"]
+    months = archived_months(start_date, end_date) if start_date else []
+    if not months or len(rows) == limit:
+        return rows
+    skip = max(0, offset - query.count())
+    archived = read_archived(months, **filters)
+    return rows + list(islice(archived, skip, skip + limit - len(rows)))
+
+
+@router.get("/page", response_model=AuditLogPage)
+def get_audit_page(
+    filters: dict = Depends(audit_filters),
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+):
+    """
+    Paginacion por cursor sobre (action_date, id): cada pagina parte de la ultima
+    fila de la anterior usando el indice compuesto, sin recorrer filas saltadas.
+    """
+    query = _filter_audit_query(db.query(AuditLog), **filters)
+    before = None
+    if cursor:
+        before = tuple(decode_cursor(cursor, datetime, int))
+        query = query.filter(tuple_(AuditLog.action_date, AuditLog.id) < before)
+
+    rows = (
+        query.order_by(AuditLog.action_date.desc(), AuditLog.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    # Los meses archivados son anteriores a los de la BD: continuan la secuencia
+    start_date, end_date = filters["start_date"], filters["end_date"]
+    months = archived_months(start_date, end_date) if start_date else []
+    if months and len(rows) <= limit:
+        archived = read_archived(months, **filters, before=before)
+        rows += list(islice(archived, limit + 1 - len(rows)))
+
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last["action_date"], last["id"])
+        else:
+            next_cursor = encode_cursor(last.action_date, last.id)
+    return {"items": items, "next_cursor": next_cursor}
+
 
 @router.put("/{log_id}/flag", response_model=AuditLogResponse)
 def flag_audit_log(
@@ -72,34 +171,63 @@ def export_audit_excel(
     db: Session = Depends(get_db),
     _: User = Depends(require_admin),
 ):
-    from openpyxl import Workbook
-
-    logs = db.query(AuditLog).order_by(AuditLog.action_date.desc()).all()
+    # Lectura por lotes (cursor del servidor) y escritura write-only: memoria acotada
+    rows = db.execute(
+        select(
+            AuditLog.id,
+            AuditLog.user_id,
+            AuditLog.user_role,
+            AuditLog.user_name,
+            AuditLog.action_date,
+            AuditLog.action,
+            AuditLog.entity_type,
+            AuditLog.entity_id,
+            AuditLog.is_flagged,
+        )
+        .order_by(AuditLog.action_date.desc())
+        .execution_options(yield_per=ROWS_PER_BATCH)
+    )
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Auditoria"
+    wb = write_only_workbook()
+    ws = wb.create_sheet("Auditoria")
     ws.append(["ID", "Usuario ID", "Rol", "Nombre", "Fecha", "Accion", "Entidad", "ID Entidad", "Destacado"])
 
-    for log in logs:
+    for log_id, user_id, role, name, action_date, action, entity_type, entity_id, flagged in rows:
         ws.append([
-            log.id,
-            log.user_id,
-            log.user_role,
-            log.user_name,
-            log.action_date.strftime("%Y-%m-%d %H:%M:%S") if log.action_date else "",
-            log.action,
-            log.entity_type,
-            log.entity_id,
-            "Si" if log.is_flagged else "No",
+            log_id,
+            user_id,
+            role,
+            name,
+            action_date.strftime("%Y-%m-%d %H:%M:%S") if action_date else "",
+            action,
+            entity_type,
+            entity_id,
+            "Si" if flagged else "No",
         ])
 
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    return xlsx_response(wb, "auditoria.xlsx")
 
-    return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=auditoria.xlsx"},
-    )
+
+AUDIT_EXPORT_COLUMNS = {
+    "id": AuditLog.id,
+    "user_id": AuditLog.user_id,
+    "user_role": AuditLog.user_role,
+    "user_name": AuditLog.user_name,
+    "action_date": AuditLog.action_date,
+    "action": AuditLog.action,
+    "entity_type": AuditLog.entity_type,
+    "entity_id": AuditLog.entity_id,
+    "is_flagged": AuditLog.is_flagged,
+    "flag_reason": AuditLog.flag_reason,
+}
+
+
+@router.get("/export")
+def export_audit(
+    export_format: str = Query("csv", alias="format", description="csv o ndjson"),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+):
+    """Exportacion de auditoria transmitida desde un cursor del servidor."""
+    stmt = select(*AUDIT_EXPORT_COLUMNS.values()).order_by(AuditLog.action_date.desc())
+    return export_response(stmt, list(AUDIT_EXPORT_COLUMNS), export_format, "auditoria")
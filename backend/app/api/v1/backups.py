@@ -173,10 +173,8 @@ def restore_backup(
 
         db.commit()
 
-        # Recalculate all station energies
-        calculator = EnergyCalculator(db)
-        for station in db.query(Station).all():
-            calculator.recalculate_station(station.id)
+        # Recalculate all station energies (one grouped statement)
+        EnergyCalculator(db).recalculate_all_stations()
 
         # Reset sequences so new inserts don't collide with restored IDs
         for tbl in ["stations", "bars", "circuits", "sub_circuits",
@@ -1,18 +1,22 @@
 from datetime import date
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.dependencies import get_current_user, require_admin, check_permission
 from app.models.user import User
+from app.models.station import Station
 from app.models.bar import Bar
 from app.models.circuit import Circuit
+from app.models.sub_circuit import SubCircuit
 from app.schemas.circuit import CircuitCreate, CircuitUpdate, CircuitStatusUpdate, CircuitResponse
 from app.services.energy_calculator import EnergyCalculator
 from app.services.audit_service import AuditService
-from app.utils.db_helpers import safe_commit
+from app.utils.db_helpers import safe_commit, safe_flush
+from app.utils.text_stream import export_response
 
 router = APIRouter(prefix="/circuits", tags=["Circuits"])
 
@@ -32,6 +36,53 @@ def get_circuits_by_bar(
     return circuits
 
 
+@router.get("/station/{station_id}/export")
+def export_station_circuits(
+    station_id: int,
+    export_format: str = Query("csv", alias="format", description="csv o ndjson"),
+    db: Session = Depends(get_db),
+    _: User = Depends(check_permission("view_circuits")),
+):
+    """Inventario de circuitos de una estacion (con la demanda de sus sub-circuitos operativos)."""
+    station = db.query(Station).filter(Station.id == station_id).first()
+    if not station:
+        raise HTTPException(status_code=404, detail="Estacion no encontrada")
+
+    sub_md = (
+        select(
+            SubCircuit.circuit_id.label("circuit_id"),
+            func.count(SubCircuit.id).label("sub_circuits"),
+            func.sum(SubCircuit.md_kw).filter(SubCircuit.status == "operative_normal").label("md_kw"),
+        )
+        .group_by(SubCircuit.circuit_id)
+        .subquery()
+    )
+    columns = {
+        "bar_name": Bar.name,
+        "bar_type": Bar.bar_type,
+        "circuit_id": Circuit.id,
+        "denomination": Circuit.denomination,
+        "name": Circuit.name,
+        "local_item": Circuit.local_item,
+        "pi_kw": Circuit.pi_kw,
+        "fd": Circuit.fd,
+        "md_kw": Circuit.md_kw,
+        "status": Circuit.status,
+        "is_ups": Circuit.is_ups,
+        "sub_circuits": func.coalesce(sub_md.c.sub_circuits, 0),
+        "sub_circuits_md_kw": func.coalesce(sub_md.c.md_kw, 0),
+        "reserve_expires_at": Circuit.reserve_expires_at,
+    }
+    stmt = (
+        select(*columns.values())
+        .join(Bar, Circuit.bar_id == Bar.id)
+        .outerjoin(sub_md, sub_md.c.circuit_id == Circuit.id)
+        .where(Bar.station_id == station_id)
+        .order_by(Bar.name, Circuit.id)
+    )
+    return export_response(stmt, list(columns), export_format, f"circuitos_{station.code}")
+
+
 @router.get("/{circuit_id}", response_model=CircuitResponse)
 def get_circuit(
     circuit_id: int,
@@ -111,13 +162,12 @@ def create_circuit(
         circuit.reserve_expires_at = data.reserve_expires_at
 
     db.add(circuit)
-    safe_commit(db)
-    db.refresh(circuit)
 
-    # Recalculate station energy
-    calculator.recalculate_station(bar.station_id)
+    # Apply the new load to the station in the same transaction
+    calculator.apply_delta(bar.station_id, calculator.circuit_load(circuit))
+    safe_flush(db)
 
-    # Audit
+    # Audit (same transaction as the circuit)
     audit = AuditService(db)
     audit.log(
         user=admin,
@@ -128,14 +178,18 @@ def create_circuit(
             "name": circuit.name,
             "denomination": circuit.denomination,
             "bar_id": bar_id,
+            "station_id": bar.station_id,
             "pi_kw": float(circuit.pi_kw),
             "md_kw": float(circuit.md_kw),
             "is_ups": circuit.is_ups,
             "secondary_bar_id": circuit.secondary_bar_id,
             "tertiary_bar_id": circuit.tertiary_bar_id,
         },
+        commit=False,
     )
 
+    safe_commit(db)
+    db.refresh(circuit)
     return circuit
 
 
@@ -159,27 +213,33 @@ def update_circuit(
         if "md_kw" not in update_data:
             update_data["md_kw"] = pi * fd
 
+    bar = db.query(Bar).filter(Bar.id == circuit.bar_id).first()
+    calculator = EnergyCalculator(db)
+    load_before = calculator.circuit_load(circuit)
+
     for field, value in update_data.items():
         setattr(circuit, field, value)
 
-    safe_commit(db)
-    db.refresh(circuit)
+    # Apply only the MD difference to the station
+    calculator.apply_delta(bar.station_id, calculator.circuit_load(circuit) - load_before)
 
-    # Recalculate station energy
-    bar = db.query(Bar).filter(Bar.id == circuit.bar_id).first()
-    calculator = EnergyCalculator(db)
-    calculator.recalculate_station(bar.station_id)
-
-    # Audit
+    # Audit (same transaction as the update)
     audit = AuditService(db)
     audit.log(
         user=admin,
         action="UPDATE_CIRCUIT",
         entity_type="circuit",
         entity_id=circuit.id,
-        details={"updated_fields": list(update_data.keys())},
+        details={
+            "updated_fields": list(update_data.keys()),
+            "bar_id": circuit.bar_id,
+            "station_id": bar.station_id,
+        },
+        commit=False,
     )
 
+    safe_commit(db)
+    db.refresh(circuit)
     return circuit
 
 
@@ -194,6 +254,10 @@ def update_circuit_status(
     if not circuit:
         raise HTTPException(status_code=404, detail="Circuito no encontrado")
 
+    bar = db.query(Bar).filter(Bar.id == circuit.bar_id).first()
+    calculator = EnergyCalculator(db)
+    load_before = calculator.circuit_load(circuit)
+
     old_status = circuit.status
     circuit.status = data.status
 
@@ -204,12 +268,7 @@ def update_circuit_status(
         circuit.reserve_since = None
         circuit.reserve_expires_at = None
 
-    safe_commit(db)
-    db.refresh(circuit)
-
-    bar = db.query(Bar).filter(Bar.id == circuit.bar_id).first()
-    calculator = EnergyCalculator(db)
-    calculator.recalculate_station(bar.station_id)
+    calculator.apply_delta(bar.station_id, calculator.circuit_load(circuit) - load_before)
 
     audit = AuditService(db)
     audit.log(
@@ -217,9 +276,17 @@ def update_circuit_status(
         action="CHANGE_CIRCUIT_STATUS",
         entity_type="circuit",
         entity_id=circuit.id,
-        details={"old_status": old_status, "new_status": data.status},
+        details={
+            "old_status": old_status,
+            "new_status": data.status,
+            "bar_id": circuit.bar_id,
+            "station_id": bar.station_id,
+        },
+        commit=False,
     )
 
+    safe_commit(db)
+    db.refresh(circuit)
     return circuit
 
 
@@ -238,13 +305,14 @@ def delete_circuit(
         "name": circuit.name,
         "denomination": circuit.denomination,
         "bar_id": circuit.bar_id,
+        "station_id": bar.station_id,
     }
 
-    db.delete(circuit)
-    safe_commit(db)
-
+    # Remove the circuit's load (and its sub-circuits') from the station
     calculator = EnergyCalculator(db)
-    calculator.recalculate_station(bar.station_id)
+    calculator.apply_delta(bar.station_id, -calculator.circuit_load(circuit))
+
+    db.delete(circuit)
 
     audit = AuditService(db)
     audit.log(
@@ -253,6 +321,9 @@ def delete_circuit(
         entity_type="circuit",
         entity_id=circuit_id,
         details=circuit_info,
+        commit=False,
     )
 
+    safe_commit(db)
+
     return {"message": "Circuito eliminado exitosamente"}
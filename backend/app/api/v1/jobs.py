@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.dependencies import require_admin
+from app.models.user import User
+from app.models.job_run import JobRun
+from app.schemas.job_run import JobRunResponse, JobStatsResponse
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get("/runs", response_model=list[JobRunResponse])
+def get_job_runs(
+    job_name: str | None = None,
+    failed: bool | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+):
+    """Ejecuciones recientes de los jobs programados."""
+    query = select(JobRun)
+    if job_name:
+        query = query.where(JobRun.job_name == job_name)
+    if failed is not None:
+        query = query.where(JobRun.error.is_not(None) if failed else JobRun.error.is_(None))
+    return db.scalars(query.order_by(JobRun.started_at.desc(), JobRun.id.desc()).limit(limit)).all()
+
+
+@router.get("/stats", response_model=list[JobStatsResponse])
+def get_job_stats(
+    days: int = Query(7, ge=1, le=365),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+):
+    """Duracion p50/p95 y fallos por job en los ultimos dias."""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    rows = db.execute(
+        select(
+            JobRun.job_name,
+            func.count().label("runs"),
+            func.count(JobRun.error).label("failures"),
+            func.percentile_cont(0.5).within_group(JobRun.duration_ms).label("p50_ms"),
+            func.percentile_cont(0.95).within_group(JobRun.duration_ms).label("p95_ms"),
+            func.max(JobRun.duration_ms).label("max_ms"),
+            func.max(JobRun.started_at).label("last_run_at"),
+        )
+        .where(JobRun.started_at >= since)
+        .group_by(JobRun.job_name)
+        .order_by(JobRun.job_name)
+    ).all()
+    return [JobStatsResponse(**row._mapping) for row in rows]
@@ -4,9 +4,11 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.dependencies import require_admin
 from app.models.user import User
+from app.models.bar import Bar
 from app.models.circuit import Circuit
 from app.models.notification import Notification
 from app.schemas.notification import NotificationResponse, NotificationExtend
+from app.services.energy_calculator import EnergyCalculator
 from app.utils.db_helpers import safe_commit
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
@@ -98,6 +100,10 @@ def resolve_reserve(
     if notif.circuit_id:
         circuit = db.query(Circuit).filter(Circuit.id == notif.circuit_id).first()
         if circuit:
+            bar = db.query(Bar).filter(Bar.id == circuit.bar_id).first()
+            calculator = EnergyCalculator(db)
+            if bar:
+                calculator.apply_delta(bar.station_id, -calculator.circuit_load(circuit))
             circuit.status = "inactive"
             circuit.reserve_since = None
             circuit.reserve_expires_at = None
@@ -1,187 +1,107 @@
 import io
-from datetime import datetime
+import json
+from datetime import date, datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-
-from decimal import Decimal
 
 from app.database import get_db
 from app.dependencies import require_admin, check_permission
 from app.models.user import User
-from app.models.station import Station
-from app.models.bar import Bar
-from app.models.circuit import Circuit
-from app.models.sub_circuit import SubCircuit
-from app.models.request import Request
 from app.models.audit_log import AuditLog
+from app.services.snapshot_service import demand_history
+from app.services.report_engine import station_demand, station_demand_series, requests_per_station
+from app.services.report_cache import get_or_compute
+from app.utils.excel_stream import write_only_workbook, spool_workbook, iter_file, XLSX_MEDIA_TYPE
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
 
+def _cached_json(db: Session, endpoint: str, params: dict, compute) -> Response:
+    """Respuesta JSON servida desde el cache de reportes."""
+    payload = get_or_compute(
+        db, endpoint, params,
+        lambda: json.dumps(jsonable_encoder(compute())).encode(),
+        "application/json",
+    )
+    return Response(content=payload, media_type="application/json")
+
+
 @router.get("/demand-evolution")
 def get_demand_evolution(
     start_date: datetime | None = None,
     end_date: datetime | None = None,
+    bucket: str | None = Query(None, description="day, week o month: serie acumulada por periodo"),
     db: Session = Depends(get_db),
     _: User = Depends(check_permission("view_reports")),
 ):
-    stations = db.query(Station).order_by(Station.order_index).all()
-
-    if not start_date and not end_date:
-        # No filter: return current station values
-        return [
-            {
-                "station_id": station.id,
-                "station_name": station.name,
-                "station_code": station.code,
-                "transformer_capacity_kw": float(station.transformer_capacity_kw),
-                "max_demand_kw": float(station.max_demand_kw),
-                "available_power_kw": float(station.available_power_kw),
-                "status": station.status,
-            }
-            for station in stations
-        ]
-
-    # With date filter: compute demand from circuits/sub-circuits created in the range
-    data = []
-    for station in stations:
-        bar_ids = [b.id for b in db.query(Bar.id).filter(Bar.station_id == station.id).all()]
-        total_md = Decimal("0")
-
-        if bar_ids:
-            circ_query = db.query(Circuit).filter(
-                Circuit.bar_id.in_(bar_ids),
-                Circuit.status != "inactive",
+    params = {"start_date": start_date, "end_date": end_date, "bucket": bucket}
+    if bucket:
+        try:
+            return _cached_json(
+                db, "demand-evolution", params,
+                lambda: station_demand_series(db, bucket, start_date, end_date),
             )
-            if start_date:
-                circ_query = circ_query.filter(Circuit.created_at >= start_date)
-            if end_date:
-                circ_query = circ_query.filter(Circuit.created_at <= end_date)
-            circuits = circ_query.all()
-            total_md += sum((c.md_kw for c in circuits), Decimal("0"))
-
-            circuit_ids = [c.id for c in circuits]
-            if circuit_ids:
-                sub_query = db.query(SubCircuit).filter(
-                    SubCircuit.circuit_id.in_(circuit_ids),
-                    SubCircuit.status == "operative_normal",
-                )
-                if start_date:
-                    sub_query = sub_query.filter(SubCircuit.created_at >= start_date)
-                if end_date:
-                    sub_query = sub_query.filter(SubCircuit.created_at <= end_date)
-                sub_circuits = sub_query.all()
-                total_md += sum((s.md_kw for s in sub_circuits), Decimal("0"))
-
-        capacity = float(station.transformer_capacity_kw)
-        demand = float(total_md)
-        data.append({
-            "station_id": station.id,
-            "station_name": station.name,
-            "station_code": station.code,
-            "transformer_capacity_kw": capacity,
-            "max_demand_kw": demand,
-            "available_power_kw": capacity - demand,
-            "status": station.status,
-        })
-
-    return data
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return _cached_json(
+        db, "demand-evolution", params,
+        lambda: station_demand(db, start_date, end_date),
+    )
 
 
-@router.get("/requests-per-station")
-def get_requests_per_station(
-    start_date: datetime | None = None,
-    end_date: datetime | None = None,
+@router.get("/demand-history")
+def get_demand_history(
+    start_date: date | None = None,
+    end_date: date | None = None,
+    station_id: int | None = None,
     db: Session = Depends(get_db),
     _: User = Depends(check_permission("view_reports")),
 ):
-    query = db.query(
-        Request.station_id,
-        Station.name,
-        Request.status,
-        func.count(Request.id).label("count"),
-    ).join(Station, Request.station_id == Station.id)
-
-    if start_date:
-        query = query.filter(Request.created_at >= start_date)
-    if end_date:
-        query = query.filter(Request.created_at <= end_date)
-
-    results = query.group_by(Request.station_id, Station.name, Request.status).all()
+    """Historico diario de demanda por estacion (tabla station_demand_snapshots)."""
+    return demand_history(db, start_date, end_date, station_id)
 
-    data = {}
-    for station_id, station_name, status, count in results:
-        if station_name not in data:
-            data[station_name] = {"station_id": station_id, "station_name": station_name, "pending": 0, "approved": 0, "rejected": 0}
-        data[station_name][status] = count
 
-    return list(data.values())
-
-
-@router.get("/export/excel")
-def export_reports_excel(
+@router.get("/requests-per-station")
+def get_requests_per_station(
     start_date: datetime | None = None,
     end_date: datetime | None = None,
     db: Session = Depends(get_db),
     _: User = Depends(check_permission("view_reports")),
 ):
-    from openpyxl import Workbook
+    return _cached_json(
+        db, "requests-per-station",
+        {"start_date": start_date, "end_date": end_date},
+        lambda: requests_per_station(db, start_date, end_date),
+    )
+
+
+def _build_reports_workbook(
+    db: Session, start_date: datetime | None, end_date: datetime | None
+) -> bytes:
     from openpyxl.chart import LineChart as XlLineChart, BarChart as XlBarChart, Reference
     from openpyxl.chart.series import DataPoint
     from openpyxl.utils import get_column_letter
 
-    wb = Workbook()
+    wb = write_only_workbook()
 
     # ── Sheet 1: Demanda Electrica ──
-    ws1 = wb.active
-    ws1.title = "Demanda Electrica"
-    ws1.append(["Estacion", "Codigo", "Capacidad (kW)", "Demanda Max (kW)", "Disponible (kW)"])
-
-    stations = db.query(Station).order_by(Station.order_index).all()
-
-    if not start_date and not end_date:
-        for s in stations:
-            ws1.append([
-                s.name, s.code,
-                float(s.transformer_capacity_kw),
-                float(s.max_demand_kw),
-                float(s.available_power_kw),
-            ])
-    else:
-        for s in stations:
-            bar_ids = [b.id for b in db.query(Bar.id).filter(Bar.station_id == s.id).all()]
-            total_md = Decimal("0")
-            if bar_ids:
-                circ_query = db.query(Circuit).filter(
-                    Circuit.bar_id.in_(bar_ids), Circuit.status != "inactive",
-                )
-                if start_date:
-                    circ_query = circ_query.filter(Circuit.created_at >= start_date)
-                if end_date:
-                    circ_query = circ_query.filter(Circuit.created_at <= end_date)
-                circuits = circ_query.all()
-                total_md += sum((c.md_kw for c in circuits), Decimal("0"))
-                circuit_ids = [c.id for c in circuits]
-                if circuit_ids:
-                    sub_q = db.query(SubCircuit).filter(
-                        SubCircuit.circuit_id.in_(circuit_ids),
-                        SubCircuit.status == "operative_normal",
-                    )
-                    if start_date:
-                        sub_q = sub_q.filter(SubCircuit.created_at >= start_date)
-                    if end_date:
-                        sub_q = sub_q.filter(SubCircuit.created_at <= end_date)
-                    total_md += sum((sc.md_kw for sc in sub_q.all()), Decimal("0"))
-            capacity = float(s.transformer_capacity_kw)
-            demand = float(total_md)
-            ws1.append([s.name, s.code, capacity, demand, capacity - demand])
-
-    # Adjust column widths
+    # En modo write-only los anchos de columna se definen antes de escribir filas
+    ws1 = wb.create_sheet("Demanda Electrica")
     for col in range(1, 6):
         ws1.column_dimensions[get_column_letter(col)].width = 22
+    ws1.append(["Estacion", "Codigo", "Capacidad (kW)", "Demanda Max (kW)", "Disponible (kW)"])
+
+    stations = station_demand(db, start_date, end_date)
+    for st in stations:
+        ws1.append([
+            st["station_name"], st["station_code"],
+            st["transformer_capacity_kw"],
+            st["max_demand_kw"],
+            st["available_power_kw"],
+        ])
 
     num_stations = len(stations)
 
@@ -214,32 +134,15 @@ def export_reports_excel(
 
     # ── Sheet 2: Solicitudes por Estacion ──
     ws2 = wb.create_sheet("Solicitudes por Estacion")
+    for col in range(1, 6):
+        ws2.column_dimensions[get_column_letter(col)].width = 20
     ws2.append(["Estacion", "Pendientes", "Aprobadas", "Rechazadas", "Total"])
 
-    query = db.query(
-        Request.station_id, Station.name, Request.status,
-        func.count(Request.id).label("count"),
-    ).join(Station, Request.station_id == Station.id)
-
-    if start_date:
-        query = query.filter(Request.created_at >= start_date)
-    if end_date:
-        query = query.filter(Request.created_at <= end_date)
+    data = requests_per_station(db, start_date, end_date)
 
-    results = query.group_by(Request.station_id, Station.name, Request.status).all()
-
-    data: dict = {}
-    for station_id, station_name, status, count in results:
-        if station_name not in data:
-            data[station_name] = {"pending": 0, "approved": 0, "rejected": 0}
-        data[station_name][status] = count
-
-    for name, counts in data.items():
+    for counts in data:
         total = counts["pending"] + counts["approved"] + counts["rejected"]
-        ws2.append([name, counts["pending"], counts["approved"], counts["rejected"], total])
-
-    for col in range(1, 6):
-        ws2.column_dimensions[get_column_letter(col)].width = 20
+        ws2.append([counts["station_name"], counts["pending"], counts["approved"], counts["rejected"], total])
 
     num_req_rows = len(data)
 
@@ -271,9 +174,23 @@ def export_reports_excel(
 
         ws2.add_chart(chart2, f"A{num_req_rows + 4}")
 
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    with spool_workbook(wb) as f:
+        return f.read()
+
+
+@router.get("/export/excel")
+def export_reports_excel(
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    db: Session = Depends(get_db),
+    _: User = Depends(check_permission("view_reports")),
+):
+    content = get_or_compute(
+        db, "export/excel",
+        {"start_date": start_date, "end_date": end_date},
+        lambda: _build_reports_workbook(db, start_date, end_date),
+        XLSX_MEDIA_TYPE,
+    )
 
     filename = "reportes.xlsx"
     if start_date or end_date:
@@ -282,7 +199,7 @@ def export_reports_excel(
         filename = f"reportes_{s}_{e}.xlsx"
 
     return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        iter_file(io.BytesIO(content)),
+        media_type=XLSX_MEDIA_TYPE,
         headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
@@ -1,7 +1,8 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session, joinedload
 
 from app.database import get_db
 from app.dependencies import get_current_user, require_admin, check_permission
@@ -11,19 +12,40 @@ from app.models.bar import Bar
 from app.models.circuit import Circuit
 from app.models.request import Request
 from app.models.sub_circuit import SubCircuit
-from app.schemas.request import RequestCreate, RequestReject, RequestResponse
+from app.schemas.request import (
+    RequestCreate,
+    RequestReject,
+    RequestResponse,
+    RequestPage,
+    RequestStatusSummary,
+    ApprovalPlan,
+    RequestBulkApprove,
+    RequestBulkReject,
+    RequestBulkResult,
+)
+from app.services.approval_planner import plan_approvals
 from app.services.energy_calculator import EnergyCalculator
 from app.services.audit_service import AuditService
-from app.utils.db_helpers import safe_commit
+from app.services.realtime import publish
+from app.utils.db_helpers import safe_commit, safe_flush
+from app.utils.pagination import encode_cursor, decode_cursor
 from sqlalchemy.exc import IntegrityError, OperationalError
 
 router = APIRouter(prefix="/requests", tags=["Requests"])
 
 
-def _enrich_request(req: Request, db: Session) -> RequestResponse:
-    opersac = db.query(User).filter(User.id == req.opersac_user_id).first()
-    station = db.query(Station).filter(Station.id == req.station_id).first()
-    circuit = db.query(Circuit).filter(Circuit.id == req.circuit_id).first() if req.circuit_id else None
+# Carga en la misma consulta las relaciones que usa _enrich_request (evita N+1)
+_RESPONSE_OPTIONS = (
+    joinedload(Request.opersac_user),
+    joinedload(Request.station),
+    joinedload(Request.circuit),
+)
+
+
+def _enrich_request(req: Request) -> RequestResponse:
+    opersac = req.opersac_user
+    station = req.station
+    circuit = req.circuit if req.circuit_id else None
     return RequestResponse(
         id=req.id,
         opersac_user_id=req.opersac_user_id,
@@ -50,6 +72,74 @@ def _enrich_request(req: Request, db: Session) -> RequestResponse:
     )
 
 
+def _apply_approval(
+    req: Request,
+    bar: Bar,
+    admin: User,
+    db: Session,
+    calculator: EnergyCalculator | None = None,
+) -> dict:
+    """
+    Crea el circuito o sub-circuito de una solicitud aprobada, la marca como
+    aprobada y agrega su registro de auditoria, sin confirmar la transaccion.
+    Con calculator se aplica el delta de demanda; sin el, la unidad de trabajo
+    recalcula la estacion una sola vez al hacer commit.
+    """
+    md_kw = req.requested_load_kw * req.fd
+
+    if req.circuit_id:
+        # Create sub-circuit on existing circuit
+        sub = SubCircuit(
+            circuit_id=req.circuit_id,
+            name=req.sub_circuit_name or f"Ampliacion Solicitud #{req.id}",
+            description=req.sub_circuit_description or req.justification,
+            itm=req.sub_circuit_itm,
+            mm2=req.sub_circuit_mm2,
+            pi_kw=req.requested_load_kw,
+            fd=req.fd,
+            md_kw=md_kw,
+            status="operative_normal",
+        )
+        db.add(sub)
+        if calculator:
+            parent = db.query(Circuit).filter(Circuit.id == req.circuit_id).first()
+            parent_bar = db.query(Bar).filter(Bar.id == parent.bar_id).first() if parent else None
+            if parent_bar:
+                calculator.apply_delta(parent_bar.station_id, calculator.sub_circuit_load(sub, parent))
+        created_entity = {"sub_circuit_created": True}
+    else:
+        # Create new circuit on bar
+        circuit = Circuit(
+            bar_id=bar.id,
+            denomination=f"AMP-{req.id}",
+            name=f"Ampliacion Solicitud #{req.id}",
+            description=req.justification,
+            local_item=req.local_item,
+            pi_kw=req.requested_load_kw,
+            fd=req.fd,
+            md_kw=md_kw,
+            status="operative_normal",
+        )
+        db.add(circuit)
+        if calculator:
+            calculator.apply_delta(bar.station_id, calculator.circuit_load(circuit))
+        created_entity = {"circuit_created": True}
+
+    req.status = "approved"
+    req.reviewed_by = admin.id
+    req.reviewed_at = datetime.now(timezone.utc)
+
+    AuditService(db).log(
+        user=admin,
+        action="APPROVE_REQUEST",
+        entity_type="request",
+        entity_id=req.id,
+        details={**created_entity, "station_id": req.station_id, "bar_id": bar.id},
+        commit=False,
+    )
+    return created_entity
+
+
 @router.get("/circuit-options/{bar_id}")
 def get_circuit_options_for_request(
     bar_id: int,
@@ -65,10 +155,126 @@ def get_circuit_options_for_request(
     return [{"id": c.id, "denomination": c.denomination, "name": c.name} for c in circuits]
 
 
+def request_filters(
+    status: str | None = None,
+    station_id: int | None = None,
+    bar_type: str | None = None,
+    opersac_user_id: int | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+) -> dict:
+    """Filtros del inbox de solicitudes."""
+    return {
+        "status": status,
+        "station_id": station_id,
+        "bar_type": bar_type,
+        "opersac_user_id": opersac_user_id,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+
+
+def _filter_requests(
+    query,
+    status: str | None = None,
+    station_id: int | None = None,
+    bar_type: str | None = None,
+    opersac_user_id: int | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+):
+    if status:
+        query = query.filter(Request.status == status)
+    if station_id:
+        query = query.filter(Request.station_id == station_id)
+    if bar_type:
+        query = query.filter(Request.bar_type == bar_type)
+    if opersac_user_id:
+        query = query.filter(Request.opersac_user_id == opersac_user_id)
+    if start_date:
+        query = query.filter(Request.created_at >= start_date)
+    if end_date:
+        query = query.filter(Request.created_at <= end_date)
+    return query
+
+
+def _request_page(db: Session, filters: dict, cursor: str | None, limit: int) -> dict:
+    """Pagina de solicitudes por cursor sobre (created_at, id), de la mas reciente a la mas antigua."""
+    query = _filter_requests(db.query(Request).options(*_RESPONSE_OPTIONS), **filters)
+    if cursor:
+        before = tuple(decode_cursor(cursor, datetime, int))
+        query = query.filter(tuple_(Request.created_at, Request.id) < before)
+    rows = query.order_by(Request.created_at.desc(), Request.id.desc()).limit(limit + 1).all()
+
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return {"items": [_enrich_request(r) for r in items], "next_cursor": next_cursor}
+
+
+def _status_summary(db: Session, filters: dict) -> dict:
+    """Cantidad de solicitudes por estado (una consulta agrupada, sin enriquecer filas)."""
+    query = _filter_requests(
+        db.query(Request.status, func.count(Request.id)), **{**filters, "status": None}
+    )
+    counts = dict(query.group_by(Request.status).all())
+    summary = {s: counts.get(s, 0) for s in ("pending", "approved", "rejected")}
+    summary["total"] = sum(counts.values())
+    return summary
+
+
+@router.get("/inbox", response_model=RequestPage)
+def get_request_inbox(
+    filters: dict = Depends(request_filters),
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+):
+    """Inbox de solicitudes con filtros y paginacion por cursor."""
+    return _request_page(db, filters, cursor, limit)
+
+
+@router.get("/inbox/summary", response_model=RequestStatusSummary)
+def get_request_inbox_summary(
+    filters: dict = Depends(request_filters),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+):
+    """Solo los conteos por estado para los mismos filtros del inbox (se ignora status)."""
+    return _status_summary(db, filters)
+
+
+@router.get("/my/page", response_model=RequestPage)
+def get_my_requests_page(
+    filters: dict = Depends(request_filters),
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    user: User = Depends(check_permission("send_requests")),
+):
+    return _request_page(db, {**filters, "opersac_user_id": user.id}, cursor, limit)
+
+
+@router.get("/my/summary", response_model=RequestStatusSummary)
+def get_my_requests_summary(
+    filters: dict = Depends(request_filters),
+    db: Session = Depends(get_db),
+    user: User = Depends(check_permission("send_requests")),
+):
+    return _status_summary(db, {**filters, "opersac_user_id": user.id})
+
+
 @router.get("", response_model=list[RequestResponse])
 def get_requests(db: Session = Depends(get_db), _: User = Depends(require_admin)):
-    requests = db.query(Request).order_by(Request.created_at.desc()).all()
-    return [_enrich_request(r, db) for r in requests]
+    requests = (
+        db.query(Request)
+        .options(*_RESPONSE_OPTIONS)
+        .order_by(Request.created_at.desc())
+        .all()
+    )
+    return [_enrich_request(r) for r in requests]
 
 
 @router.get("/my", response_model=list[RequestResponse])
@@ -78,11 +284,12 @@ def get_my_requests(
 ):
     requests = (
         db.query(Request)
+        .options(*_RESPONSE_OPTIONS)
         .filter(Request.opersac_user_id == user.id)
         .order_by(Request.created_at.desc())
         .all()
     )
-    return [_enrich_request(r, db) for r in requests]
+    return [_enrich_request(r) for r in requests]
 
 
 @router.post("", response_model=RequestResponse)
@@ -114,8 +321,7 @@ def create_request(
         status="pending",
     )
     db.add(req)
-    safe_commit(db)
-    db.refresh(req)
+    safe_flush(db)
 
     audit = AuditService(db)
     audit.log(
@@ -124,9 +330,147 @@ def create_request(
         entity_type="request",
         entity_id=req.id,
         details={"station_id": data.station_id, "bar_type": data.bar_type},
+        commit=False,
+    )
+    publish(db, "request_created", {
+        "request_id": req.id,
+        "station_id": req.station_id,
+        "station_name": station.name,
+        "bar_type": req.bar_type,
+        "requested_load_kw": float(req.requested_load_kw),
+        "user_name": user.full_name,
+    })
+
+    safe_commit(db)
+    db.refresh(req)
+    return _enrich_request(req)
+
+
+@router.get("/approval-plan", response_model=ApprovalPlan)
+def get_approval_plan(db: Session = Depends(get_db), _: User = Depends(require_admin)):
+    """Conjunto de solicitudes pendientes aprobables en lote sin dejar estaciones en rojo."""
+    return plan_approvals(db)
+
+
+def _lock_pending(db: Session, ids: list[int]) -> tuple[dict[int, Request], dict[int, str]]:
+    """
+    Bloquea (SELECT ... FOR UPDATE, en orden de id) las solicitudes indicadas y
+    separa las que siguen pendientes de las que no se pueden procesar.
+    """
+    locked = (
+        db.query(Request)
+        .filter(Request.id.in_(ids))
+        .order_by(Request.id)
+        .with_for_update()
+        .populate_existing()
+        .all()
     )
+    by_id = {r.id: r for r in locked}
+    pending, errors = {}, {}
+    for request_id in ids:
+        req = by_id.get(request_id)
+        if not req:
+            errors[request_id] = "Solicitud no encontrada"
+        elif req.status != "pending":
+            errors[request_id] = f"La solicitud ya fue procesada ({req.status})"
+        else:
+            pending[request_id] = req
+    return pending, errors
+
+
+def _lock_pending_one(db: Session, request_id: int, not_pending_detail: str) -> Request:
+    """
+    Bloquea una solicitud con _lock_pending: dos revisiones concurrentes se
+    serializan y la segunda ve el estado ya actualizado.
+    """
+    pending, errors = _lock_pending(db, [request_id])
+    if request_id in pending:
+        return pending[request_id]
+    if errors[request_id] == "Solicitud no encontrada":
+        raise HTTPException(status_code=404, detail=errors[request_id])
+    raise HTTPException(status_code=400, detail=not_pending_detail)
+
+
+def _bulk_result(db: Session, ids: list[int], done: list[int], errors: dict[int, str]) -> dict:
+    """Resultado por solicitud, en el orden recibido; las procesadas van enriquecidas."""
+    enriched = {
+        r.id: _enrich_request(r)
+        for r in db.query(Request).options(*_RESPONSE_OPTIONS).filter(Request.id.in_(done)).all()
+    } if done else {}
+    results = [
+        {"request_id": i, "ok": i in enriched, "error": errors.get(i), "request": enriched.get(i)}
+        for i in ids
+    ]
+    return {"processed": len(enriched), "failed": len(ids) - len(enriched), "results": results}
+
+
+@router.post("/bulk-approve", response_model=RequestBulkResult)
+def bulk_approve_requests(
+    data: RequestBulkApprove,
+    db: Session = Depends(get_db),
+    admin: User = Depends(require_admin),
+):
+    """
+    Aprueba varias solicitudes en una transaccion: bloquea las filas pendientes,
+    crea los circuitos/sub-circuitos y la auditoria de cada una en un SAVEPOINT y
+    recalcula cada estacion afectada una vez. Las solicitudes invalidas (o cuyo
+    flush viola una restriccion) se informan por item sin anular el resto del lote.
+    """
+    ids = list(dict.fromkeys(data.request_ids))
+    pending, errors = _lock_pending(db, ids)
+
+    station_ids = {r.station_id for r in pending.values()}
+    bars: dict[tuple[int, str], Bar] = {}
+    if station_ids:
+        for b in db.query(Bar).filter(Bar.station_id.in_(station_ids)).order_by(Bar.id).all():
+            bars.setdefault((b.station_id, b.bar_type), b)
+
+    done = []
+    for request_id, req in sorted(pending.items(), key=lambda kv: (kv[1].created_at, kv[0])):
+        bar = bars.get((req.station_id, req.bar_type))
+        if not bar:
+            errors[request_id] = "Barra no encontrada para la estacion"
+            continue
+        try:
+            with db.begin_nested():
+                _apply_approval(req, bar, admin, db)
+        except IntegrityError:
+            errors[request_id] = "Error al aprobar la solicitud: dato duplicado o invalido"
+            continue
+        done.append(request_id)
+
+    safe_commit(db, "Error al aprobar las solicitudes: dato duplicado o invalido")
+    return _bulk_result(db, ids, done, errors)
+
+
+@router.post("/bulk-reject", response_model=RequestBulkResult)
+def bulk_reject_requests(
+    data: RequestBulkReject,
+    db: Session = Depends(get_db),
+    admin: User = Depends(require_admin),
+):
+    """Rechaza varias solicitudes pendientes en una transaccion, con resultado por item."""
+    ids = list(dict.fromkeys(data.request_ids))
+    pending, errors = _lock_pending(db, ids)
+
+    audit = AuditService(db)
+    reviewed_at = datetime.now(timezone.utc)
+    for req in pending.values():
+        req.status = "rejected"
+        req.rejection_reason = data.rejection_reason
+        req.reviewed_by = admin.id
+        req.reviewed_at = reviewed_at
+        audit.log(
+            user=admin,
+            action="REJECT_REQUEST",
+            entity_type="request",
+            entity_id=req.id,
+            details={"reason": data.rejection_reason, "station_id": req.station_id},
+            commit=False,
+        )
 
-    return _enrich_request(req, db)
+    safe_commit(db)
+    return _bulk_result(db, ids, list(pending), errors)
 
 
 @router.put("/{request_id}/approve", response_model=RequestResponse)
@@ -135,11 +479,7 @@ def approve_request(
     db: Session = Depends(get_db),
     admin: User = Depends(require_admin),
 ):
-    req = db.query(Request).filter(Request.id == request_id).first()
-    if not req:
-        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-    if req.status != "pending":
-        raise HTTPException(status_code=400, detail="Solo se pueden aprobar solicitudes pendientes")
+    req = _lock_pending_one(db, request_id, "Solo se pueden aprobar solicitudes pendientes")
 
     # Find the correct bar
     bar = (
@@ -150,43 +490,8 @@ def approve_request(
     if not bar:
         raise HTTPException(status_code=404, detail="Barra no encontrada para la estacion")
 
-    md_kw = req.requested_load_kw * req.fd
-
     try:
-        if req.circuit_id:
-            # Create sub-circuit on existing circuit
-            sub = SubCircuit(
-                circuit_id=req.circuit_id,
-                name=req.sub_circuit_name or f"Ampliacion Solicitud #{req.id}",
-                description=req.sub_circuit_description or req.justification,
-                itm=req.sub_circuit_itm,
-                mm2=req.sub_circuit_mm2,
-                pi_kw=req.requested_load_kw,
-                fd=req.fd,
-                md_kw=md_kw,
-            )
-            db.add(sub)
-            created_entity = {"sub_circuit_created": True}
-        else:
-            # Create new circuit on bar
-            circuit = Circuit(
-                bar_id=bar.id,
-                denomination=f"AMP-{req.id}",
-                name=f"Ampliacion Solicitud #{req.id}",
-                description=req.justification,
-                local_item=req.local_item,
-                pi_kw=req.requested_load_kw,
-                fd=req.fd,
-                md_kw=md_kw,
-                status="operative_normal",
-            )
-            db.add(circuit)
-            created_entity = {"circuit_created": True}
-
-        req.status = "approved"
-        req.reviewed_by = admin.id
-        req.reviewed_at = datetime.now(timezone.utc)
-
+        _apply_approval(req, bar, admin, db, EnergyCalculator(db))
         db.commit()
         db.refresh(req)
     except IntegrityError:
@@ -196,20 +501,7 @@ def approve_request(
         db.rollback()
         raise HTTPException(status_code=503, detail="Error de conexion con la base de datos al aprobar la solicitud")
 
-    # Recalculate energy
-    calculator = EnergyCalculator(db)
-    calculator.recalculate_station(req.station_id)
-
-    audit = AuditService(db)
-    audit.log(
-        user=admin,
-        action="APPROVE_REQUEST",
-        entity_type="request",
-        entity_id=req.id,
-        details={**created_entity, "station_id": req.station_id},
-    )
-
-    return _enrich_request(req, db)
+    return _enrich_request(req)
 
 
 @router.put("/{request_id}/reject", response_model=RequestResponse)
@@ -219,27 +511,24 @@ def reject_request(
     db: Session = Depends(get_db),
     admin: User = Depends(require_admin),
 ):
-    req = db.query(Request).filter(Request.id == request_id).first()
-    if not req:
-        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-    if req.status != "pending":
-        raise HTTPException(status_code=400, detail="Solo se pueden rechazar solicitudes pendientes")
+    req = _lock_pending_one(db, request_id, "Solo se pueden rechazar solicitudes pendientes")
 
     req.status = "rejected"
     req.rejection_reason = data.rejection_reason
     req.reviewed_by = admin.id
     req.reviewed_at = datetime.now(timezone.utc)
 
-    safe_commit(db)
-    db.refresh(req)
-
     audit = AuditService(db)
     audit.log(
         user=admin,
         action="REJECT_REQUEST",
         entity_type="request",
         entity_id=req.id,
-        details={"reason": data.rejection_reason},
+        details={"reason": data.rejection_reason, "station_id": req.station_id},
+        commit=False,
     )
 
-    return _enrich_request(req, db)
+    safe_commit(db)
+    db.refresh(req)
+
+    return _enrich_request(req)
@@ -1,13 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.dependencies import get_current_user, require_admin, check_permission
 from app.models.user import User
 from app.models.station import Station
-from app.schemas.station import StationResponse, StationUpdate, PowerSummary
+from app.schemas.station import StationResponse, StationUpdate, PowerSummary, TimelinePage
+from app.schemas.simulation import (
+    SimulationRequest,
+    SimulationResult,
+    SimulatedStation,
+    ContingencyResult,
+    ContingencyBarOverload,
+    ContingencyStationOverload,
+)
 from app.services.energy_calculator import EnergyCalculator
+from app.services.demand_model import DemandModel, status_colors
+from app.services.timeline import station_timeline
 from app.utils.db_helpers import safe_commit
+from app.utils.pagination import encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/stations", tags=["Stations"])
 
@@ -18,6 +32,103 @@ def get_stations(db: Session = Depends(get_db), _: User = Depends(check_permissi
     return stations
 
 
+@router.post("/simulate", response_model=list[SimulationResult])
+def simulate_stations(
+    data: SimulationRequest,
+    db: Session = Depends(get_db),
+    _: User = Depends(check_permission("view_stations")),
+):
+    """Evalua en lote escenarios hipoteticos (altas, retiros y cambios de estado)."""
+    model = DemandModel(db)
+    try:
+        demand = model.simulate(
+            [[c.model_dump() for c in sc.changes] for sc in data.scenarios]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    available = model.capacity_kw - demand
+    colors = status_colors(model.capacity_kw, available)
+
+    return [
+        SimulationResult(
+            name=sc.name,
+            stations=[
+                SimulatedStation(
+                    station_id=int(model.station_ids[j]),
+                    station_name=model.station_names[j],
+                    max_demand_kw=round(float(demand[i, j]), 2),
+                    available_power_kw=round(float(available[i, j]), 2),
+                    status=str(colors[i, j]),
+                )
+                for j in range(len(model.station_ids))
+            ],
+        )
+        for i, sc in enumerate(data.scenarios)
+    ]
+
+
+@router.get("/contingency", response_model=list[ContingencyResult])
+def get_contingency_analysis(
+    only_violations: bool = True,
+    db: Session = Depends(get_db),
+    _: User = Depends(check_permission("view_stations")),
+):
+    """
+    Analisis N-1: pierde cada barra operativa, transfiere sus cargas UPS a las barras
+    alternativas y reporta barras/estaciones que exceden su capacidad.
+    """
+    model = DemandModel(db)
+    result = model.contingency()
+    bar_load = result["bar_load_kw"]
+    bar_current = result["bar_current_a"]
+    station_load = result["station_load_kw"]
+
+    bar_over = (
+        ((model.bar_capacity_kw > 0) & (bar_load > model.bar_capacity_kw))
+        | ((model.bar_capacity_a > 0) & (bar_current > model.bar_capacity_a))
+    )
+    station_over = station_load > model.capacity_kw
+
+    contingencies = []
+    for k in np.flatnonzero(model.bar_active):
+        if only_violations and not (bar_over[k].any() or station_over[k].any()):
+            continue
+        st = model.bar_station[k]
+        contingencies.append(
+            ContingencyResult(
+                lost_bar_id=int(model.bar_ids[k]),
+                lost_bar_name=model.bar_names[k],
+                station_id=int(model.station_ids[st]),
+                station_name=model.station_names[st],
+                transferred_kw=round(float(result["transferred_kw"][k]), 2),
+                dropped_kw=round(float(result["dropped_kw"][k]), 2),
+                overloaded_bars=[
+                    ContingencyBarOverload(
+                        bar_id=int(model.bar_ids[j]),
+                        bar_name=model.bar_names[j],
+                        station_id=int(model.station_ids[model.bar_station[j]]),
+                        load_kw=round(float(bar_load[k, j]), 2),
+                        capacity_kw=float(model.bar_capacity_kw[j]),
+                        current_a=round(float(bar_current[k, j]), 2),
+                        capacity_a=float(model.bar_capacity_a[j]),
+                    )
+                    for j in np.flatnonzero(bar_over[k])
+                ],
+                overloaded_stations=[
+                    ContingencyStationOverload(
+                        station_id=int(model.station_ids[j]),
+                        station_name=model.station_names[j],
+                        demand_kw=round(float(station_load[k, j]), 2),
+                        transformer_capacity_kw=float(model.capacity_kw[j]),
+                    )
+                    for j in np.flatnonzero(station_over[k])
+                ],
+            )
+        )
+    return contingencies
+
+
 @router.get("/{station_id}", response_model=StationResponse)
 def get_station(
     station_id: int,
@@ -49,6 +160,27 @@ def get_power_summary(
     )
 
 
+@router.get("/{station_id}/timeline", response_model=TimelinePage)
+def get_station_timeline(
+    station_id: int,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+):
+    """Auditoria, notificaciones, observaciones y solicitudes de la estacion, de la mas reciente a la mas antigua."""
+    station = db.query(Station).filter(Station.id == station_id).first()
+    if not station:
+        raise HTTPException(status_code=404, detail="Estacion no encontrada")
+
+    after = tuple(decode_cursor(cursor, datetime, str, int)) if cursor else None
+    items, next_key = station_timeline(db, station_id, after, limit)
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(*next_key) if next_key else None,
+    }
+
+
 @router.put("/{station_id}", response_model=StationResponse)
 def update_station(
     station_id: int,
@@ -13,7 +13,7 @@ from app.models.bar import Bar
 from app.schemas.sub_circuit import SubCircuitCreate, SubCircuitUpdate, SubCircuitResponse, SubCircuitStatusUpdate
 from app.services.energy_calculator import EnergyCalculator
 from app.services.audit_service import AuditService
-from app.utils.db_helpers import safe_commit
+from app.utils.db_helpers import safe_commit, safe_flush
 
 router = APIRouter(prefix="/sub-circuits", tags=["Sub-Circuits"])
 
@@ -62,13 +62,13 @@ def create_sub_circuit(
         sub.reserve_expires_at = data.reserve_expires_at
 
     db.add(sub)
-    safe_commit(db)
-    db.refresh(sub)
 
-    # Recalculate station energy (sub-circuits affect totals)
+    # Apply the new load to the station (sub-circuits affect totals)
     bar = db.query(Bar).filter(Bar.id == circuit.bar_id).first()
     if bar:
-        EnergyCalculator(db).recalculate_station(bar.station_id)
+        calculator = EnergyCalculator(db)
+        calculator.apply_delta(bar.station_id, calculator.sub_circuit_load(sub, circuit))
+    safe_flush(db)
 
     audit = AuditService(db)
     audit.log(
@@ -76,9 +76,17 @@ def create_sub_circuit(
         action="CREATE_SUB_CIRCUIT",
         entity_type="sub_circuit",
         entity_id=sub.id,
-        details={"name": sub.name, "circuit_id": circuit_id},
+        details={
+            "name": sub.name,
+            "circuit_id": circuit_id,
+            "bar_id": circuit.bar_id,
+            "station_id": bar.station_id if bar else None,
+        },
+        commit=False,
     )
 
+    safe_commit(db)
+    db.refresh(sub)
     return sub
 
 
@@ -92,17 +100,21 @@ def delete_sub_circuit(
     if not sub:
         raise HTTPException(status_code=404, detail="Sub-circuito no encontrado")
 
-    info = {"name": sub.name, "circuit_id": sub.circuit_id}
-    circuit_id = sub.circuit_id
-    db.delete(sub)
-    safe_commit(db)
+    # Remove the sub-circuit's load from the station (sub-circuits affect totals)
+    circuit = db.query(Circuit).filter(Circuit.id == sub.circuit_id).first()
+    bar = db.query(Bar).filter(Bar.id == circuit.bar_id).first() if circuit else None
+    if bar:
+        calculator = EnergyCalculator(db)
+        calculator.apply_delta(bar.station_id, -calculator.sub_circuit_load(sub, circuit))
 
-    # Recalculate station energy (sub-circuits affect totals)
-    circuit = db.query(Circuit).filter(Circuit.id == circuit_id).first()
-    if circuit:
-        bar = db.query(Bar).filter(Bar.id == circuit.bar_id).first()
-        if bar:
-            EnergyCalculator(db).recalculate_station(bar.station_id)
+    info = {
+        "name": sub.name,
+        "circuit_id": sub.circuit_id,
+        "bar_id": circuit.bar_id if circuit else None,
+        "station_id": bar.station_id if bar else None,
+    }
+
+    db.delete(sub)
 
     audit = AuditService(db)
     audit.log(
@@ -111,8 +123,11 @@ def delete_sub_circuit(
         entity_type="sub_circuit",
         entity_id=sub_circuit_id,
         details=info,
+        commit=False,
     )
 
+    safe_commit(db)
+
     return {"message": "Sub-circuito eliminado exitosamente"}
 
 
@@ -127,6 +142,10 @@ def update_sub_circuit_status(
     if not sub:
         raise HTTPException(status_code=404, detail="Sub-circuito no encontrado")
 
+    circuit = db.query(Circuit).filter(Circuit.id == sub.circuit_id).first()
+    calculator = EnergyCalculator(db)
+    load_before = calculator.sub_circuit_load(sub, circuit)
+
     old_status = sub.status
     sub.status = data.status
 
@@ -137,14 +156,11 @@ def update_sub_circuit_status(
         sub.reserve_since = None
         sub.reserve_expires_at = None
 
-    safe_commit(db)
-    db.refresh(sub)
-
-    circuit = db.query(Circuit).filter(Circuit.id == sub.circuit_id).first()
-    if circuit:
-        bar = db.query(Bar).filter(Bar.id == circuit.bar_id).first()
-        if bar:
-            EnergyCalculator(db).recalculate_station(bar.station_id)
+    bar = db.query(Bar).filter(Bar.id == circuit.bar_id).first() if circuit else None
+    if bar:
+        calculator.apply_delta(
+            bar.station_id, calculator.sub_circuit_load(sub, circuit) - load_before
+        )
 
     audit = AuditService(db)
     audit.log(
@@ -152,7 +168,15 @@ def update_sub_circuit_status(
         action="CHANGE_SUB_CIRCUIT_STATUS",
         entity_type="sub_circuit",
         entity_id=sub.id,
-        details={"old_status": old_status, "new_status": data.status},
+        details={
+            "old_status": old_status,
+            "new_status": data.status,
+            "bar_id": circuit.bar_id if circuit else None,
+            "station_id": bar.station_id if bar else None,
+        },
+        commit=False,
     )
 
+    safe_commit(db)
+    db.refresh(sub)
     return sub
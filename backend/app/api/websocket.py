@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from starlette.concurrency import run_in_threadpool
+
+from app.database import SessionLocal
+from app.dependencies import get_current_user, require_admin
+from app.models.notification import Notification
+from app.services.realtime import NOTIFICATIONS_WS_CHANNEL
+from app.utils.websocket_manager import manager
+
+# Fuera de /api/v1: nginx reenvia /ws/ al backend sin reescribir la ruta
+router = APIRouter(prefix="/ws", tags=["WebSocket"])
+
+
+def _authenticate(token: str) -> int:
+    """Valida el token (solo administradores) y retorna las notificaciones sin leer."""
+    db = SessionLocal()
+    try:
+        require_admin(get_current_user(token, db))
+        return (
+            db.query(Notification)
+            .filter(Notification.is_read == False, Notification.is_dismissed == False)
+            .count()
+        )
+    finally:
+        db.close()
+
+
+@router.websocket("/notifications")
+async def notifications_ws(websocket: WebSocket, token: str = Query(...)):
+    """
+    Eventos en tiempo real para administradores: notification_created,
+    station_status_changed y request_created. El token va en ?token= porque el
+    navegador no permite cabeceras en el handshake.
+    """
+    try:
+        unread_count = await run_in_threadpool(_authenticate, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await manager.connect(websocket, NOTIFICATIONS_WS_CHANNEL)
+    try:
+        await websocket.send_json({"type": "unread_count", "data": {"unread_count": unread_count}})
+        # Los mensajes del cliente (pings) se ignoran
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(websocket, NOTIFICATIONS_WS_CHANNEL)
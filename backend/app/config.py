@@ -18,6 +18,34 @@ class Settings(BaseSettings):
     STORAGE_PATH: str = "storage"
     MAX_IMAGE_SIZE_MB: int = 10
 
+    # Demand snapshots: ademas de la foto diaria, guardar una en cada recalculo
+    SNAPSHOT_ON_RECALCULATION: bool = False
+
+    # Report cache (tabla report_cache, compartida entre workers)
+    REPORT_CACHE_MAX_ENTRIES: int = 200
+
+    # Auditoria: "sync" escribe en la transaccion del request; "buffered" encola y
+    # un hilo inserta por lotes (con escritura sincrona si la cola esta llena)
+    AUDIT_SINK: str = "sync"
+    AUDIT_QUEUE_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_S: float = 1.0
+
+    # Particiones mensuales de audit_logs: meses creados por adelantado y meses
+    # conservados en la BD (los anteriores se archivan en STORAGE_PATH/audit_archive)
+    AUDIT_PARTITIONS_AHEAD: int = 2
+    AUDIT_RETENTION_MONTHS: int = 12
+
+    # Vencimiento de reservas: hora local en que se notifican las del dia
+    RESERVE_CHECK_HOUR: int = 8
+
+    # Jobs programados: solo el proceso que tiene el advisory lock los ejecuta; los
+    # demas reintentan tomarlo cada SCHEDULER_LEADER_POLL_S segundos
+    SCHEDULER_LOCK_KEY: int = 7310001
+    SCHEDULER_LEADER_POLL_S: float = 10.0
+    # Advisory lock que serializa la preparacion del esquema al iniciar cada worker
+    STARTUP_LOCK_KEY: int = 7310002
+
     # CORS
     CORS_ORIGINS: list[str] = ["http://localhost:5173", "http://localhost:3000"]
 
@@ -1,12 +1,24 @@
+import asyncio
+from contextlib import contextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import text
 
 from app.config import settings
 from app.api.v1.router import api_router
+from app.api.websocket import router as ws_router
 from app.database import engine, Base, SessionLocal
 from app.models import *  # noqa: F401 - Import all models for table creation
+from app.services import unit_of_work  # noqa: F401 - Register session unit-of-work hooks
+from app.services.audit_writer import audit_writer
+from app.services.reserve_scheduler import reserve_scheduler, RESERVE_DEADLINES_CHANNEL
+from app.services.leader_election import scheduler_leader
+from app.services.job_registry import job_registry
+from app.services.realtime import event_relay
+from app.services.audit_partitions import prepare_audit_partitions
+from app.services.notification_service import dismiss_duplicate_reserve_notifications
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -34,33 +46,150 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 # Include API routes
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
+# WebSocket en la raiz (/ws/...), como lo reenvia nginx
+app.include_router(ws_router)
 
 
 @app.on_event("startup")
 def on_startup():
     # Create tables if they don't exist (for development)
-    Base.metadata.create_all(bind=engine)
-    _seed_initial_data()
+    with _startup_lock():
+        _ensure_extensions()
+        Base.metadata.create_all(bind=engine)
+        prepare_audit_partitions(engine)
+        _migrate_audit_details()
+        _drop_snapshot_station_fk()
+        dismiss_duplicate_reserve_notifications(engine)
+        _ensure_indexes()
+        _seed_initial_data()
+
+    if settings.AUDIT_SINK == "buffered":
+        audit_writer.start()
 
-    from app.services.notification_service import check_expiring_reserves
+    # Reenvio de eventos (pg_notify) a los WebSocket de este worker
+    event_relay.start(asyncio.get_running_loop())
+
+    from app.services.energy_calculator import EnergyCalculator
+    from app.services.snapshot_service import take_snapshot
+    from app.services.audit_partitions import ensure_partitions, archive_old_partitions
 
     def run_reserve_check():
+        # Red de seguridad: recarga el heap de vencimientos desde la BD (los vencidos se disparan)
+        return {"rows_scanned": reserve_scheduler.rebuild()}
+
+    def run_demand_reconciliation():
+        # Recalcula la demanda desde cero y corrige la desviacion del modo incremental
+        db = SessionLocal()
+        try:
+            drift = EnergyCalculator(db).reconcile()
+            if drift:
+                total_kw = sum(abs(d["drift_kw"]) for d in drift)
+                station_ids = ", ".join(str(d["station_id"]) for d in drift)
+                print(
+                    f"[DEMAND DRIFT] {len(drift)} estacion(es) corregida(s), "
+                    f"desviacion total {total_kw:.2f} kW (ids: {station_ids})"
+                )
+            # Estaciones corregidas: se actualizan filas existentes, no se insertan
+            return {"rows_scanned": len(drift)}
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def run_demand_snapshot():
+        # Foto diaria de la demanda de todas las estaciones (historico de reportes)
         db = SessionLocal()
         try:
-            check_expiring_reserves(db)
+            written = take_snapshot(db)
+            db.commit()
+            return {"rows_inserted": written}
         except Exception:
-            # Si falla, el scheduler no se desregistra y reintentara manana
-            pass
+            db.rollback()
+            raise
         finally:
             db.close()
 
-    # Ejecutar verificación inmediata al iniciar
-    run_reserve_check()
+    def run_audit_retention():
+        # Particiones de los proximos meses y archivado de las que superan la retencion
+        ensure_partitions(engine)
+        archive_old_partitions(engine)
+
+    # Recarga diaria de vencimientos a las 00:05, reconciliacion de demanda a las 03:00,
+    # foto diaria de demanda a las 23:55 y retencion de auditoria el dia 1 de cada mes
+    job_registry.add_job("reserve_rebuild", run_reserve_check, "cron", hour=0, minute=5)
+    job_registry.add_job("demand_reconciliation", run_demand_reconciliation, "cron", hour=3, minute=0)
+    job_registry.add_job("demand_snapshot", run_demand_snapshot, "cron", hour=23, minute=55)
+    job_registry.add_job("audit_retention", run_audit_retention, "cron", day=1, hour=2, minute=0)
+
+    def start_background_jobs():
+        # Planificador de vencimientos de reservas: al iniciar dispara los ya vencidos
+        reserve_scheduler.start()
+        job_registry.run("demand_snapshot")
+        job_registry.start()
+
+    def stop_background_jobs():
+        job_registry.shutdown()
+        reserve_scheduler.stop()
+
+    # Los jobs corren en un solo proceso (el que tiene el advisory lock); los demas
+    # workers envian sus vencimientos de reservas al lider por NOTIFY
+    scheduler_leader.listen(RESERVE_DEADLINES_CHANNEL, reserve_scheduler.push_notification)
+    scheduler_leader.start(start_background_jobs, stop_background_jobs)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    # Escribe las entradas de auditoria que sigan en cola antes de salir
+    audit_writer.stop()
+    # Detiene los jobs y libera el lock para que otro proceso los tome
+    scheduler_leader.stop()
+    event_relay.stop()
+
+
+@contextmanager
+def _startup_lock():
+    # Los workers preparan el esquema de a uno: el lock se mantiene hasta el fin de
+    # esta transaccion; los demas esperan y encuentran todo ya creado
+    with engine.connect() as conn, conn.begin():
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": settings.STARTUP_LOCK_KEY})
+        yield
+
+
+def _ensure_extensions():
+    # pg_trgm: indices trigram para busquedas ILIKE '%...%' en auditoria
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
+def _migrate_audit_details():
+    # audit_logs.details pasa de JSON a JSONB (necesario para el indice GIN)
+    with engine.begin() as conn:
+        data_type = conn.execute(text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_name = 'audit_logs' AND column_name = 'details'"
+        )).scalar()
+        if data_type == "json":
+            conn.execute(text(
+                "ALTER TABLE audit_logs ALTER COLUMN details TYPE JSONB USING details::jsonb"
+            ))
+
+
+def _drop_snapshot_station_fk():
+    # station_demand_snapshots ya no depende de stations (el ON DELETE CASCADE borraba
+    # el historico al restaurar un backup)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE station_demand_snapshots "
+            "DROP CONSTRAINT IF EXISTS station_demand_snapshots_station_id_fkey"
+        ))
+
 
-    # Programar verificación diaria a las 08:00
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(run_reserve_check, "cron", hour=8, minute=0)
-    scheduler.start()
+def _ensure_indexes():
+    # create_all no agrega indices nuevos a tablas que ya existen
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 
 def _seed_initial_data():
@@ -9,6 +9,9 @@ from app.models.notification import Notification
 from app.models.observation import Observation
 from app.models.audit_log import AuditLog
 from app.models.backup import Backup
+from app.models.station_demand_snapshot import StationDemandSnapshot
+from app.models.report_cache import ReportCache, ReportDataVersion
+from app.models.job_run import JobRun
 
 __all__ = [
     "User",
@@ -22,4 +25,8 @@ __all__ = [
     "Observation",
     "AuditLog",
     "Backup",
+    "StationDemandSnapshot",
+    "ReportCache",
+    "ReportDataVersion",
+    "JobRun",
 ]
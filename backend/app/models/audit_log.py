@@ -1,7 +1,8 @@
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import String, Integer, Boolean, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import String, Integer, Boolean, DateTime, ForeignKey, Text, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -9,6 +10,30 @@ from app.database import Base
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # Clave de la paginacion por cursor: ORDER BY action_date DESC, id DESC
+    # Particionada por mes sobre action_date (ver services/audit_partitions.py);
+    # la clave de particion debe formar parte de la clave primaria
+    __table_args__ = (
+        Index("ix_audit_logs_action_date_id", "action_date", "id"),
+        # Historial por entidad (timeline de estaciones)
+        Index("ix_audit_logs_entity", "entity_type", "entity_id", "action_date", "id"),
+        # Historial por estacion de details (timeline): (details->>'station_id')::int
+        Index(
+            "ix_audit_logs_details_station",
+            text("((details ->> 'station_id')::int)"), "action_date", "id",
+        ),
+        # Busquedas por contenido de details (@>) y por subcadena en action/user_name (pg_trgm)
+        Index("ix_audit_logs_details", "details", postgresql_using="gin"),
+        Index(
+            "ix_audit_logs_action_trgm", "action",
+            postgresql_using="gin", postgresql_ops={"action": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_audit_logs_user_name_trgm", "user_name",
+            postgresql_using="gin", postgresql_ops={"user_name": "gin_trgm_ops"},
+        ),
+        {"postgresql_partition_by": "RANGE (action_date)"},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(
@@ -17,12 +42,16 @@ class AuditLog(Base):
     user_role: Mapped[str] = mapped_column(String(20), nullable=False)
     user_name: Mapped[str] = mapped_column(String(100), nullable=False)
     action_date: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), index=True
+        DateTime(timezone=True),
+        primary_key=True,
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        index=True,
     )
     action: Mapped[str] = mapped_column(String(100), nullable=False)
     entity_type: Mapped[str] = mapped_column(String(50), nullable=False)
     entity_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
-    details: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    details: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
     is_flagged: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     flag_reason: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
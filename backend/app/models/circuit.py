@@ -2,7 +2,7 @@ from datetime import datetime, date, timezone
 from decimal import Decimal
 from typing import Optional
 
-from sqlalchemy import String, Integer, Numeric, DateTime, Date, ForeignKey, Boolean, Text
+from sqlalchemy import String, Integer, Numeric, DateTime, Date, ForeignKey, Boolean, Text, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -10,6 +10,13 @@ from app.database import Base
 
 class Circuit(Base):
     __tablename__ = "circuits"
+    # Vencimientos de reservas (reconstruccion del planificador de vencimientos)
+    __table_args__ = (
+        Index(
+            "ix_circuits_reserve_expires", "reserve_expires_at",
+            postgresql_where=text("status IN ('reserve_r', 'reserve_equipped_re') AND reserve_expires_at IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     bar_id: Mapped[int] = mapped_column(
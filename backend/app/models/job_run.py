@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import String, Integer, DateTime, Text, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class JobRun(Base):
+    __tablename__ = "job_runs"
+    # Ejecuciones recientes por job: ORDER BY started_at DESC
+    __table_args__ = (Index("ix_job_runs_job_started", "job_name", "started_at"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    job_name: Mapped[str] = mapped_column(String(60), nullable=False)
+    started_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, index=True,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    duration_ms: Mapped[int] = mapped_column(Integer, nullable=False)
+    rows_scanned: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    rows_inserted: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
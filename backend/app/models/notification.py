@@ -1,7 +1,7 @@
 from datetime import datetime, date, timezone
 from typing import Optional
 
-from sqlalchemy import String, Integer, Boolean, DateTime, Date, ForeignKey, Text
+from sqlalchemy import String, Integer, Boolean, DateTime, Date, ForeignKey, Text, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -9,6 +9,23 @@ from app.database import Base
 
 class Notification(Base):
     __tablename__ = "notifications"
+    # Timeline de estaciones: ORDER BY created_at DESC, id DESC por estacion
+    __table_args__ = (
+        Index("ix_notifications_station_created", "station_id", "created_at", "id"),
+        # Una sola notificacion de reserva sin descartar por circuito (ver check_expiring_reserves)
+        Index(
+            "uq_notifications_active_reserve", "circuit_id",
+            unique=True,
+            postgresql_where=text("type = 'reserve_no_contact' AND NOT is_dismissed"),
+        ),
+        # Extensiones vigentes (planificador de vencimientos)
+        Index(
+            "ix_notifications_reserve_extended", "extended_until",
+            postgresql_where=text(
+                "type = 'reserve_no_contact' AND NOT is_dismissed AND extended_until IS NOT NULL"
+            ),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     station_id: Mapped[Optional[int]] = mapped_column(
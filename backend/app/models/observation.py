@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Text
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -9,6 +9,12 @@ from app.database import Base
 
 class Observation(Base):
     __tablename__ = "observations"
+    # Timeline de estaciones: observaciones por barra, circuito o sub-circuito
+    __table_args__ = (
+        Index("ix_observations_bar_created", "bar_id", "created_at", "id"),
+        Index("ix_observations_circuit_created", "circuit_id", "created_at", "id"),
+        Index("ix_observations_sub_circuit_created", "sub_circuit_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     circuit_id: Mapped[Optional[int]] = mapped_column(
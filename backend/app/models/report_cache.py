@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import String, BigInteger, Integer, DateTime, LargeBinary
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+class ReportDataVersion(Base):
+    """
+    Contador global de version de datos (una sola fila, id = 1). Se incrementa en
+    la misma transaccion que cada escritura sobre estaciones, circuitos,
+    sub-circuitos y solicitudes (ver unit_of_work), asi que la version nueva se
+    hace visible junto con los datos.
+    """
+
+    __tablename__ = "report_data_versions"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
+class ReportCache(Base):
+    __tablename__ = "report_cache"
+
+    cache_key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    endpoint: Mapped[str] = mapped_column(String(100), nullable=False)
+    data_version: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    media_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    last_accessed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True
+    )
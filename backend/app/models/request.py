@@ -2,7 +2,7 @@ from datetime import datetime, timezone
 from decimal import Decimal
 from typing import Optional
 
-from sqlalchemy import String, Integer, Numeric, DateTime, ForeignKey, Text
+from sqlalchemy import String, Integer, Numeric, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -10,6 +10,11 @@ from app.database import Base
 
 class Request(Base):
     __tablename__ = "requests"
+    # Timeline e inbox: ORDER BY created_at DESC, id DESC por estacion o por estado
+    __table_args__ = (
+        Index("ix_requests_station_created", "station_id", "created_at", "id"),
+        Index("ix_requests_status_created", "status", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     opersac_user_id: Mapped[int] = mapped_column(
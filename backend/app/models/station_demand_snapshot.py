@@ -0,0 +1,30 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import String, Integer, Numeric, Date, DateTime, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.database import Base
+
+
+class StationDemandSnapshot(Base):
+    __tablename__ = "station_demand_snapshots"
+    __table_args__ = (UniqueConstraint("station_id", "snapshot_date"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # Sin FK: el historico se conserva cuando restore_backup borra y recrea las estaciones
+    station_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    snapshot_date: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    transformer_capacity_kw: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    max_demand_kw: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    available_power_kw: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+    station = relationship(
+        "Station",
+        primaryjoin="foreign(StationDemandSnapshot.station_id) == Station.id",
+        viewonly=True,
+    )
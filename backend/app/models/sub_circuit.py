@@ -2,7 +2,7 @@ from datetime import date, datetime, timezone
 from decimal import Decimal
 from typing import Optional
 
-from sqlalchemy import String, Integer, Numeric, DateTime, Date, ForeignKey, Text
+from sqlalchemy import String, Integer, Numeric, DateTime, Date, ForeignKey, Text, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -10,6 +10,13 @@ from app.database import Base
 
 class SubCircuit(Base):
     __tablename__ = "sub_circuits"
+    # Vencimientos de reservas (reconstruccion del planificador de vencimientos)
+    __table_args__ = (
+        Index(
+            "ix_sub_circuits_reserve_expires", "reserve_expires_at",
+            postgresql_where=text("status IN ('reserve_r', 'reserve_equipped_re') AND reserve_expires_at IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     circuit_id: Mapped[int] = mapped_column(
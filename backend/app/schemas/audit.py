@@ -21,6 +21,11 @@ class AuditLogResponse(BaseModel):
         from_attributes = True
 
 
+class AuditLogPage(BaseModel):
+    items: list[AuditLogResponse]
+    next_cursor: Optional[str] = None
+
+
 class AuditFlagUpdate(BaseModel):
     is_flagged: bool
     flag_reason: Optional[str] = None
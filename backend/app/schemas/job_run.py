@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class JobRunResponse(BaseModel):
+    id: int
+    job_name: str
+    started_at: datetime
+    duration_ms: int
+    rows_scanned: Optional[int] = None
+    rows_inserted: Optional[int] = None
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class JobStatsResponse(BaseModel):
+    job_name: str
+    runs: int
+    failures: int
+    p50_ms: float
+    p95_ms: float
+    max_ms: int
+    last_run_at: datetime
@@ -49,3 +49,54 @@ class RequestResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class RequestPage(BaseModel):
+    items: list[RequestResponse]
+    next_cursor: Optional[str] = None
+
+
+class RequestStatusSummary(BaseModel):
+    pending: int = 0
+    approved: int = 0
+    rejected: int = 0
+    total: int = 0
+
+
+class StationApprovalPlan(BaseModel):
+    station_id: int
+    station_name: str
+    headroom_kw: float
+    selected_kw: float
+    remaining_kw: float
+    selected_request_ids: list[int]
+    deferred_request_ids: list[int]
+
+
+class ApprovalPlan(BaseModel):
+    stations: list[StationApprovalPlan]
+    approvable_request_ids: list[int]
+    deferred_request_ids: list[int]
+    requests_without_bar: list[int]
+
+
+class RequestBulkApprove(BaseModel):
+    request_ids: list[int]
+
+
+class RequestBulkReject(BaseModel):
+    request_ids: list[int]
+    rejection_reason: str
+
+
+class RequestBulkItem(BaseModel):
+    request_id: int
+    ok: bool
+    error: Optional[str] = None
+    request: Optional[RequestResponse] = None
+
+
+class RequestBulkResult(BaseModel):
+    processed: int
+    failed: int
+    results: list[RequestBulkItem]
@@ -0,0 +1,62 @@
+from decimal import Decimal
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class SimulationChange(BaseModel):
+    action: str  # add, remove, status
+    bar_id: Optional[int] = None  # add
+    md_kw: Optional[Decimal] = None  # add
+    circuit_id: Optional[int] = None  # remove, status
+    status: Optional[str] = None  # status
+
+
+class SimulationScenario(BaseModel):
+    name: Optional[str] = None
+    changes: list[SimulationChange]
+
+
+class SimulationRequest(BaseModel):
+    scenarios: list[SimulationScenario]
+
+
+class SimulatedStation(BaseModel):
+    station_id: int
+    station_name: str
+    max_demand_kw: float
+    available_power_kw: float
+    status: str
+
+
+class SimulationResult(BaseModel):
+    name: Optional[str] = None
+    stations: list[SimulatedStation]
+
+
+class ContingencyBarOverload(BaseModel):
+    bar_id: int
+    bar_name: str
+    station_id: int
+    load_kw: float
+    capacity_kw: float
+    current_a: float
+    capacity_a: float
+
+
+class ContingencyStationOverload(BaseModel):
+    station_id: int
+    station_name: str
+    demand_kw: float
+    transformer_capacity_kw: float
+
+
+class ContingencyResult(BaseModel):
+    lost_bar_id: int
+    lost_bar_name: str
+    station_id: int
+    station_name: str
+    transferred_kw: float
+    dropped_kw: float
+    overloaded_bars: list[ContingencyBarOverload]
+    overloaded_stations: list[ContingencyStationOverload]
@@ -26,6 +26,21 @@ class StationUpdate(BaseModel):
     max_demand_kw: Optional[Decimal] = None
 
 
+class TimelineEvent(BaseModel):
+    source: str
+    id: int
+    occurred_at: datetime
+    kind: str
+    summary: str
+    user_name: Optional[str] = None
+    details: Optional[dict] = None
+
+
+class TimelinePage(BaseModel):
+    items: list[TimelineEvent]
+    next_cursor: Optional[str] = None
+
+
 class PowerSummary(BaseModel):
     station_id: int
     station_name: str
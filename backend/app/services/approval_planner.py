@@ -0,0 +1,116 @@
+import math
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.station import Station
+from app.models.bar import Bar
+from app.models.request import Request
+
+# Resoluciones (kW) para discretizar la mochila; se usa la mas fina que quepa en memoria
+_RESOLUTIONS_KW = (Decimal("0.01"), Decimal("0.1"), Decimal("1"))
+_MAX_CELLS = 50_000_000
+
+
+def _knapsack(weights: list[int], values: list[int], capacity: int) -> list[int]:
+    """Mochila 0/1 vectorizada por fila; retorna los indices elegidos."""
+    best = np.zeros(capacity + 1, dtype=np.int64)
+    keep = np.zeros((len(weights), capacity + 1), dtype=bool)
+    for i, (w, v) in enumerate(zip(weights, values)):
+        if w > capacity:
+            continue
+        candidate = best[: capacity + 1 - w] + v
+        improved = candidate > best[w:]
+        keep[i, w:] = improved
+        best[w:] = np.where(improved, candidate, best[w:])
+
+    chosen = []
+    c = capacity
+    for i in range(len(weights) - 1, -1, -1):
+        if keep[i, c]:
+            chosen.append(i)
+            c -= weights[i]
+    return sorted(chosen)
+
+
+def _request_md(req: Request) -> Decimal:
+    return req.requested_load_kw * req.fd
+
+
+def plan_approvals(db: Session) -> dict:
+    """
+    Calcula el conjunto de solicitudes pendientes que pueden aprobarse juntas sin
+    que ninguna estacion pase a rojo (potencia disponible < 0).
+
+    Por estacion se resuelve una mochila 0/1 con capacidad = potencia disponible:
+    se maximiza la carga aprobada y, a igual carga, se prefieren las solicitudes
+    mas antiguas (la antiguedad es la prioridad; Request no tiene otro campo de prioridad).
+    """
+    pending = (
+        db.query(Request)
+        .filter(Request.status == "pending")
+        .order_by(Request.created_at, Request.id)
+        .all()
+    )
+    stations = {s.id: s for s in db.query(Station).all()}
+    bar_keys = {
+        (station_id, bar_type)
+        for station_id, bar_type in db.query(Bar.station_id, Bar.bar_type).all()
+    }
+
+    by_station: dict[int, list[Request]] = defaultdict(list)
+    without_bar = []
+    for req in pending:
+        if (req.station_id, req.bar_type) in bar_keys:
+            by_station[req.station_id].append(req)
+        else:
+            without_bar.append(req.id)
+
+    plans = []
+    approvable, deferred = [], list(without_bar)
+    for station_id, reqs in by_station.items():
+        station = stations[station_id]
+        headroom = max(station.available_power_kw, Decimal("0"))
+        md = [_request_md(r) for r in reqs]
+
+        for resolution in _RESOLUTIONS_KW:
+            capacity = int(headroom / resolution)
+            if len(reqs) * (capacity + 1) <= _MAX_CELLS:
+                break
+        # Pesos redondeados hacia arriba: la discretizacion nunca sobrepasa la capacidad
+        weights = [math.ceil(m / resolution) for m in md]
+
+        # Valor lexicografico: primero la carga aprobada, luego la antiguedad
+        n = len(reqs)
+        scale = n * (n + 1) // 2 + 1
+        values = [
+            math.ceil(m / _RESOLUTIONS_KW[0]) * scale + (n - rank)
+            for rank, m in enumerate(md)
+        ]
+
+        chosen = set(_knapsack(weights, values, capacity))
+        selected = [r for i, r in enumerate(reqs) if i in chosen]
+        rest = [r for i, r in enumerate(reqs) if i not in chosen]
+        selected_kw = sum((md[i] for i in chosen), Decimal("0"))
+
+        approvable.extend(r.id for r in selected)
+        deferred.extend(r.id for r in rest)
+        plans.append({
+            "station_id": station_id,
+            "station_name": station.name,
+            "headroom_kw": float(station.available_power_kw),
+            "selected_kw": float(selected_kw),
+            "remaining_kw": float(station.available_power_kw - selected_kw),
+            "selected_request_ids": [r.id for r in selected],
+            "deferred_request_ids": [r.id for r in rest],
+        })
+
+    plans.sort(key=lambda p: stations[p["station_id"]].order_index)
+    return {
+        "stations": plans,
+        "approvable_request_ids": approvable,
+        "deferred_request_ids": deferred,
+        "requests_without_bar": without_bar,
+    }
@@ -0,0 +1,298 @@
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import Iterator
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.models.audit_log import AuditLog
+
+# Particiones mensuales: audit_logs_pYYYYMM; las filas fuera de rango van a audit_logs_default
+_PARTITION_RE = re.compile(r"^audit_logs_p(\d{4})(\d{2})$")
+_DEFAULT_PARTITION = "audit_logs_default"
+# Archivos: audit_logs_pYYYYMM[.<ejecucion>].ndjson.gz; un mes puede tener varios
+# (p. ej. filas que llegaron tarde a la particion por defecto y se archivaron despues)
+_ARCHIVE_RE = re.compile(r"^audit_logs_p(\d{4})(\d{2})(?:\.\w+)?\.ndjson\.gz$")
+_COLUMNS = [c.name for c in AuditLog.__table__.columns]
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, months: int) -> date:
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"audit_logs_p{month.year:04d}{month.month:02d}"
+
+
+def archive_dir() -> str:
+    return os.path.join(settings.STORAGE_PATH, "audit_archive")
+
+
+def _archive_path(month: date, run: str) -> str:
+    return os.path.join(archive_dir(), f"{_partition_name(month)}.{run}.ndjson.gz")
+
+
+def _archive_files(month: date) -> list[str]:
+    """Archivos del mes, incluido el de nombre sin ejecucion de versiones anteriores."""
+    prefix = f"{_partition_name(month)}."
+    return sorted(
+        os.path.join(archive_dir(), file_name)
+        for file_name in os.listdir(archive_dir())
+        if file_name.startswith(prefix) and _ARCHIVE_RE.match(file_name)
+    )
+
+
+def _is_partitioned(conn) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'audit_logs')"
+    )).scalar()
+
+
+def _create_partition(conn, month: date) -> None:
+    start, end = month, _add_months(month, 1)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF audit_logs "
+        f"FOR VALUES FROM ('{start.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+    ))
+
+
+def _move_default_rows(conn, month: date) -> int:
+    """
+    Crea la particion del mes con las filas que quedaron en la particion por
+    defecto: tabla suelta, traslado de filas (DELETE ... RETURNING) y ATTACH.
+    Retorna cuantas filas se movieron.
+    """
+    name = _partition_name(month)
+    start, end = month, _add_months(month, 1)
+    bounds = f"FROM ('{start.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+    columns = ", ".join(_COLUMNS)
+    # Bloquea inserciones en la particion por defecto hasta el ATTACH
+    conn.execute(text(f"LOCK TABLE {_DEFAULT_PARTITION} IN EXCLUSIVE MODE"))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE audit_logs INCLUDING DEFAULTS)"))
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {_DEFAULT_PARTITION} "
+        f"WHERE action_date >= :start AND action_date < :end RETURNING {columns}) "
+        f"INSERT INTO {name} ({columns}) SELECT {columns} FROM moved"
+    ), {
+        "start": datetime.combine(start, datetime.min.time(), timezone.utc),
+        "end": datetime.combine(end, datetime.min.time(), timezone.utc),
+    }).rowcount
+    conn.execute(text(f"ALTER TABLE audit_logs ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    return moved
+
+
+def ensure_partitions(engine: Engine, months_ahead: int | None = None) -> None:
+    """
+    Crea la particion del mes actual, las de los proximos meses y la particion por
+    defecto. Las filas que hayan caido en la particion por defecto se mueven a la
+    particion de su mes (y luego se archivan con la retencion normal).
+    """
+    ahead = settings.AUDIT_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    current = _month_start(datetime.now(timezone.utc).date())
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {_DEFAULT_PARTITION} PARTITION OF audit_logs DEFAULT"))
+        stranded = conn.execute(text(
+            f"SELECT DISTINCT date_trunc('month', action_date AT TIME ZONE 'UTC')::date "
+            f"FROM {_DEFAULT_PARTITION}"
+        )).scalars().all()
+
+    # Una transaccion por mes: un error en un mes no afecta a los demas
+    for month in sorted(stranded):
+        try:
+            with engine.begin() as conn:
+                moved = _move_default_rows(conn, month)
+            print(f"[AUDIT PARTITIONS] {moved} filas movidas de {_DEFAULT_PARTITION} a {_partition_name(month)}")
+        except Exception as e:
+            print(f"[AUDIT PARTITIONS] No se pudo crear {_partition_name(month)}: {e}")
+
+    for i in range(ahead + 1):
+        try:
+            with engine.begin() as conn:
+                _create_partition(conn, _add_months(current, i))
+        except Exception as e:
+            print(f"[AUDIT PARTITIONS] No se pudo crear {_partition_name(_add_months(current, i))}: {e}")
+
+
+def prepare_audit_partitions(engine: Engine) -> None:
+    """
+    Deja audit_logs particionada por mes. Si la tabla existe sin particionar la
+    migra en una sola transaccion: renombra la tabla original, crea la particionada,
+    copia las filas y elimina la original.
+    """
+    with engine.begin() as conn:
+        if not _is_partitioned(conn):
+            print("[AUDIT PARTITIONS] Migrando audit_logs a tabla particionada por mes")
+            conn.execute(text("ALTER TABLE audit_logs RENAME TO audit_logs_legacy"))
+            # Los nombres de indices son globales: se liberan para la tabla nueva
+            for (name,) in conn.execute(text(
+                "SELECT indexname FROM pg_indexes WHERE tablename = 'audit_logs_legacy'"
+            )).all():
+                conn.execute(text(f'ALTER INDEX "{name}" RENAME TO "{name}_legacy"'))
+
+            AuditLog.__table__.create(bind=conn)
+            conn.execute(text(f"CREATE TABLE {_DEFAULT_PARTITION} PARTITION OF audit_logs DEFAULT"))
+
+            first, last = conn.execute(text(
+                "SELECT MIN(action_date), MAX(action_date) FROM audit_logs_legacy"
+            )).one()
+            if first is not None:
+                month = _month_start(first.astimezone(timezone.utc).date())
+                last_month = _month_start(last.astimezone(timezone.utc).date())
+                while month <= last_month:
+                    _create_partition(conn, month)
+                    month = _add_months(month, 1)
+
+            columns = ", ".join(_COLUMNS)
+            conn.execute(text(
+                f"INSERT INTO audit_logs ({columns}) SELECT {columns} FROM audit_logs_legacy"
+            ))
+            conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('audit_logs', 'id'), "
+                "COALESCE((SELECT MAX(id) FROM audit_logs), 1))"
+            ))
+            conn.execute(text("DROP TABLE audit_logs_legacy"))
+
+    ensure_partitions(engine)
+
+
+def archive_old_partitions(engine: Engine, retention_months: int | None = None) -> list[str]:
+    """
+    Archiva en STORAGE_PATH/audit_archive (NDJSON comprimido) las particiones de
+    meses anteriores a la retencion y luego las separa y elimina de la BD. Cada
+    ejecucion escribe archivos nuevos: si un mes ya tenia archivo no se reemplaza.
+    Retorna los nombres de las particiones archivadas.
+    """
+    retention = settings.AUDIT_RETENTION_MONTHS if retention_months is None else retention_months
+    cutoff = _add_months(_month_start(datetime.now(timezone.utc).date()), -retention)
+
+    with engine.connect() as conn:
+        partitions = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'audit_logs'"
+        )).scalars().all()
+
+    old = []
+    for name in partitions:
+        match = _PARTITION_RE.match(name)
+        if match:
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if month < cutoff:
+                old.append((month, name))
+
+    os.makedirs(archive_dir(), exist_ok=True)
+    run = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    archived = []
+    for month, name in sorted(old):
+        path = _archive_path(month, run)
+        tmp_path = f"{path}.tmp"
+        with engine.connect() as conn:
+            rows = conn.execution_options(stream_results=True, yield_per=2000).execute(text(
+                f"SELECT {', '.join(_COLUMNS)} FROM {name} ORDER BY action_date DESC, id DESC"
+            ))
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                for row in rows:
+                    record = dict(row._mapping)
+                    record["action_date"] = record["action_date"].isoformat()
+                    f.write(json.dumps(record, ensure_ascii=False))
+                    f.write("\n")
+        os.replace(tmp_path, path)
+
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE audit_logs DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        archived.append(name)
+        print(f"[AUDIT PARTITIONS] {name} archivada en {path}")
+    return archived
+
+
+def archived_months(start_date: datetime, end_date: datetime | None = None) -> list[date]:
+    """Meses archivados que se solapan con el rango, del mas reciente al mas antiguo."""
+    if not os.path.isdir(archive_dir()):
+        return []
+    first = _month_start(start_date.date())
+    last = _month_start(end_date.date()) if end_date else None
+    months = []
+    for file_name in os.listdir(archive_dir()):
+        match = _ARCHIVE_RE.match(file_name)
+        if not match:
+            continue
+        month = date(int(match.group(1)), int(match.group(2)), 1)
+        if month >= first and (last is None or month <= last):
+            months.append(month)
+    return sorted(set(months), reverse=True)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def read_archived(
+    months: list[date],
+    entity_type: str | None = None,
+    entity_id: int | None = None,
+    user_id: int | None = None,
+    user_name: str | None = None,
+    action: str | None = None,
+    is_flagged: bool | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    details_bar_id: int | None = None,
+    details_station_id: int | None = None,
+    before: tuple[datetime, int] | None = None,
+) -> Iterator[dict]:
+    """
+    Registros archivados de los meses dados que cumplen los mismos filtros que
+    GET /audit, en orden (action_date, id) descendente. before aplica el cursor
+    de paginacion.
+    """
+    start = _as_utc(start_date) if start_date else None
+    end = _as_utc(end_date) if end_date else None
+    before = (_as_utc(before[0]), before[1]) if before else None
+    action = action.lower() if action else None
+    user_name = user_name.lower() if user_name else None
+
+    for month in months:
+        rows = []
+        for path in _archive_files(month):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    row = json.loads(line)
+                    row["action_date"] = datetime.fromisoformat(row["action_date"])
+                    if entity_type and row["entity_type"] != entity_type:
+                        continue
+                    if entity_id and row["entity_id"] != entity_id:
+                        continue
+                    if user_id and row["user_id"] != user_id:
+                        continue
+                    if user_name and user_name not in row["user_name"].lower():
+                        continue
+                    if action and action not in row["action"].lower():
+                        continue
+                    details = row["details"] or {}
+                    if details_bar_id is not None and details.get("bar_id") != details_bar_id:
+                        continue
+                    if details_station_id is not None and details.get("station_id") != details_station_id:
+                        continue
+                    if is_flagged is not None and row["is_flagged"] != is_flagged:
+                        continue
+                    if start and row["action_date"] < start:
+                        continue
+                    if end and row["action_date"] > end:
+                        continue
+                    if before and (row["action_date"], row["id"]) >= before:
+                        continue
+                    rows.append(row)
+        rows.sort(key=lambda r: (r["action_date"], r["id"]), reverse=True)
+        yield from rows
@@ -1,6 +1,11 @@
+from datetime import datetime, timezone
+
 from sqlalchemy.orm import Session
+
+from app.config import settings
 from app.models.audit_log import AuditLog
 from app.models.user import User
+from app.services.audit_writer import audit_writer
 
 
 class AuditService:
@@ -14,19 +19,33 @@ class AuditService:
         entity_type: str,
         entity_id: int | None = None,
         details: dict | None = None,
+        commit: bool = True,
     ) -> AuditLog:
-        audit = AuditLog(
-            user_id=user.id,
-            user_role=user.role,
-            user_name=user.full_name,
-            action=action,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            details=details,
-        )
+        """
+        Registra una accion. Con commit=False solo se agrega a la sesion para que
+        se confirme junto con el cambio auditado en una unica transaccion.
+        Con AUDIT_SINK="buffered" las acciones con commit se encolan para el
+        escritor en segundo plano (el registro retornado no tiene id).
+        """
+        entry = {
+            "user_id": user.id,
+            "user_role": user.role,
+            "user_name": user.full_name,
+            "action_date": datetime.now(timezone.utc),
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "details": details,
+            "is_flagged": False,
+        }
+        audit = AuditLog(**entry)
+        if commit and settings.AUDIT_SINK == "buffered" and audit_writer.enqueue(entry):
+            return audit
+
         self.db.add(audit)
-        self.db.commit()
-        self.db.refresh(audit)
+        if commit:
+            self.db.commit()
+            self.db.refresh(audit)
         return audit
 
     def get_logs(
@@ -0,0 +1,103 @@
+import queue
+import threading
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.audit_log import AuditLog
+
+_STOP = object()
+
+
+class AuditWriter:
+    """
+    Escritor de auditoria en segundo plano: las entradas se encolan en memoria y un
+    hilo las inserta por lotes con un INSERT multi-fila. La cola es acotada; si esta
+    llena, enqueue() retorna False y el llamador escribe de forma sincrona.
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, flush_interval_s: float):
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._batch_size = batch_size
+        self._flush_interval_s = flush_interval_s
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detiene el hilo despues de escribir todas las entradas pendientes."""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def enqueue(self, entry: dict) -> bool:
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self._flush_interval_s)
+            except queue.Empty:
+                continue
+            while True:
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= self._batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._flush(batch)
+            # Al detenerse se vacia lo que quede en la cola
+            if stopping:
+                rest = []
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        rest.append(item)
+                for i in range(0, len(rest), self._batch_size):
+                    self._flush(rest[i:i + self._batch_size])
+
+    def _flush(self, batch: list[dict]) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(insert(AuditLog).values(batch))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[AUDIT WRITER] Error al escribir {len(batch)} registros: {e}")
+        finally:
+            db.close()
+
+
+audit_writer = AuditWriter(
+    maxsize=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval_s=settings.AUDIT_FLUSH_INTERVAL_S,
+)
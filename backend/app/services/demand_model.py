@@ -0,0 +1,251 @@
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app.models.station import Station
+from app.models.bar import Bar
+from app.models.circuit import Circuit
+from app.models.sub_circuit import SubCircuit
+from app.utils.enums import CircuitStatus
+from app.utils.constants import BAR_NOMINAL_VOLTAGE_V, BAR_POWER_FACTOR
+
+_CIRCUIT_STATUSES = {s.value for s in CircuitStatus}
+
+
+def status_colors(capacity: np.ndarray, available: np.ndarray) -> np.ndarray:
+    """Version vectorizada del color de estado de EnergyCalculator."""
+    return np.select(
+        [available < 0, (capacity > 0) & (available < capacity * 0.2)],
+        ["red", "yellow"],
+        default="green",
+    )
+
+
+def _positions(ids: np.ndarray, sorter: np.ndarray, wanted: np.ndarray, label: str) -> np.ndarray:
+    """Traduce ids de BD a posiciones en los arreglos del modelo."""
+    if wanted.size == 0:
+        return wanted.astype(np.int64)
+    pos = np.searchsorted(ids, wanted, sorter=sorter)
+    pos = np.minimum(pos, len(ids) - 1) if len(ids) else pos
+    found = ids[sorter[pos]] == wanted if len(ids) else np.zeros(wanted.shape, dtype=bool)
+    if not found.all():
+        missing = sorted(set(wanted[~found].tolist()))
+        raise ValueError(f"{label} no encontrado(s): {missing}")
+    return sorter[pos]
+
+
+class DemandModel:
+    """
+    Modelo de demanda de toda la linea cargado una sola vez en arreglos NumPy.
+    Permite evaluar escenarios hipoteticos sin volver a consultar la base de datos.
+    """
+
+    def __init__(self, db: Session):
+        stations = db.execute(
+            select(
+                Station.id, Station.name, Station.code, Station.transformer_capacity_kw
+            ).order_by(Station.order_index)
+        ).all()
+        bars = db.execute(
+            select(
+                Bar.id, Bar.station_id, Bar.name, Bar.status, Bar.capacity_kw, Bar.capacity_a
+            )
+        ).all()
+
+        sub_md = (
+            select(
+                SubCircuit.circuit_id.label("circuit_id"),
+                func.sum(SubCircuit.md_kw).label("md_kw"),
+            )
+            .where(SubCircuit.status == "operative_normal")
+            .group_by(SubCircuit.circuit_id)
+            .subquery()
+        )
+        circuits = db.execute(
+            select(
+                Circuit.id,
+                Circuit.bar_id,
+                Circuit.md_kw,
+                Circuit.status,
+                Circuit.is_ups,
+                Circuit.secondary_bar_id,
+                Circuit.tertiary_bar_id,
+                func.coalesce(sub_md.c.md_kw, 0),
+            ).outerjoin(sub_md, sub_md.c.circuit_id == Circuit.id)
+        ).all()
+
+        # Estaciones
+        self.station_ids = np.array([s[0] for s in stations], dtype=np.int64)
+        self.station_names = [s[1] for s in stations]
+        self.station_codes = [s[2] for s in stations]
+        self.capacity_kw = np.array([float(s[3]) for s in stations], dtype=np.float64)
+        self._station_sorter = np.argsort(self.station_ids)
+
+        # Barras
+        self.bar_ids = np.array([b[0] for b in bars], dtype=np.int64)
+        self._bar_sorter = np.argsort(self.bar_ids)
+        self.bar_station = _positions(
+            self.station_ids, self._station_sorter,
+            np.array([b[1] for b in bars], dtype=np.int64), "Estacion",
+        )
+        self.bar_names = [b[2] for b in bars]
+        self.bar_active = np.array([b[3] != "inactive" for b in bars], dtype=bool)
+        self.bar_capacity_kw = np.array([float(b[4] or 0) for b in bars], dtype=np.float64)
+        self.bar_capacity_a = np.array([float(b[5] or 0) for b in bars], dtype=np.float64)
+
+        # Circuitos: md propio + md de sus sub-circuitos operativos
+        self.circuit_ids = np.array([c[0] for c in circuits], dtype=np.int64)
+        self._circuit_sorter = np.argsort(self.circuit_ids)
+        self.circuit_bar = _positions(
+            self.bar_ids, self._bar_sorter,
+            np.array([c[1] for c in circuits], dtype=np.int64), "Barra",
+        )
+        self.circuit_full_md = np.array(
+            [float(c[2]) + float(c[7]) for c in circuits], dtype=np.float64
+        )
+        self.circuit_active = np.array([c[3] != "inactive" for c in circuits], dtype=bool)
+        self.circuit_is_ups = np.array([bool(c[4]) for c in circuits], dtype=bool)
+        self.circuit_secondary = self._optional_bars([c[5] for c in circuits])
+        self.circuit_tertiary = self._optional_bars([c[6] for c in circuits])
+
+    def _optional_bars(self, ids: list[int | None]) -> np.ndarray:
+        """Posicion de barras opcionales; -1 cuando no hay barra asignada."""
+        out = np.full(len(ids), -1, dtype=np.int64)
+        present = np.array([i is not None for i in ids], dtype=bool)
+        if present.any():
+            wanted = np.array([i for i in ids if i is not None], dtype=np.int64)
+            out[present] = _positions(self.bar_ids, self._bar_sorter, wanted, "Barra")
+        return out
+
+    @property
+    def circuit_load(self) -> np.ndarray:
+        """Demanda efectiva de cada circuito (cero si esta inactivo)."""
+        return np.where(self.circuit_active, self.circuit_full_md, 0.0)
+
+    @property
+    def bar_load(self) -> np.ndarray:
+        return np.bincount(self.circuit_bar, weights=self.circuit_load, minlength=len(self.bar_ids))
+
+    @property
+    def station_load(self) -> np.ndarray:
+        return np.bincount(self.bar_station, weights=self.bar_load, minlength=len(self.station_ids))
+
+    def station_positions(self, station_ids) -> np.ndarray:
+        return _positions(
+            self.station_ids, self._station_sorter,
+            np.asarray(station_ids, dtype=np.int64), "Estacion",
+        )
+
+    def simulate(self, scenarios: list[list[dict]]) -> np.ndarray:
+        """
+        Evalua escenarios independientes sobre el estado actual. Cada escenario es
+        una lista de cambios:
+          - {"action": "add", "bar_id", "md_kw"}: nueva carga en una barra
+          - {"action": "remove", "circuit_id"}: retira un circuito (con sus sub-circuitos)
+          - {"action": "status", "circuit_id", "status"}: cambia el estado de un circuito
+        Si un escenario modifica varias veces el mismo circuito, vale el ultimo cambio
+        (los deltas se calculan sobre el estado actual y no deben sumarse).
+        Retorna la demanda por estacion de cada escenario (matriz escenarios × estaciones).
+        """
+        scen, action, bar_id, circuit_id, md_kw, new_status = [], [], [], [], [], []
+        for i, changes in enumerate(scenarios):
+            # Ultimo retiro/cambio de estado de cada circuito del escenario
+            circuit_changes: dict[int, dict] = {}
+            for ch in changes:
+                kind = ch.get("action")
+                if kind == "add":
+                    if ch.get("bar_id") is None or ch.get("md_kw") is None:
+                        raise ValueError("'add' requiere bar_id y md_kw")
+                elif kind in ("remove", "status"):
+                    if ch.get("circuit_id") is None:
+                        raise ValueError(f"'{kind}' requiere circuit_id")
+                    if kind == "status" and ch.get("status") not in _CIRCUIT_STATUSES:
+                        raise ValueError(f"Estado de circuito invalido: {ch.get('status')}")
+                else:
+                    raise ValueError(f"Accion invalida: {kind}")
+                if kind != "add":
+                    circuit_changes[ch["circuit_id"]] = ch
+                    continue
+                scen.append(i)
+                action.append(kind)
+                bar_id.append(ch["bar_id"])
+                circuit_id.append(0)
+                md_kw.append(float(ch["md_kw"]))
+                new_status.append("")
+            for ch in circuit_changes.values():
+                scen.append(i)
+                action.append(ch["action"])
+                bar_id.append(0)
+                circuit_id.append(ch["circuit_id"])
+                md_kw.append(0.0)
+                new_status.append(ch.get("status") or "")
+
+        demand = np.tile(self.station_load, (len(scenarios), 1))
+        if not scen:
+            return demand
+
+        scen = np.array(scen, dtype=np.int64)
+        action = np.array(action)
+        bar_id = np.array(bar_id, dtype=np.int64)
+        circuit_id = np.array(circuit_id, dtype=np.int64)
+        md_kw = np.array(md_kw, dtype=np.float64)
+        new_status = np.array(new_status)
+
+        # Nuevas cargas
+        is_add = action == "add"
+        add_bars = _positions(self.bar_ids, self._bar_sorter, bar_id[is_add], "Barra")
+        np.add.at(demand, (scen[is_add], self.bar_station[add_bars]), md_kw[is_add])
+
+        # Retiros y cambios de estado: nueva carga - carga actual
+        is_mod = ~is_add
+        circ = _positions(self.circuit_ids, self._circuit_sorter, circuit_id[is_mod], "Circuito")
+        stays_active = (action[is_mod] == "status") & (new_status[is_mod] != "inactive")
+        delta = np.where(stays_active, self.circuit_full_md[circ], 0.0) - self.circuit_load[circ]
+        np.add.at(demand, (scen[is_mod], self.bar_station[self.circuit_bar[circ]]), delta)
+
+        return demand
+
+    def contingency(self) -> dict:
+        """
+        Analisis N-1: simula la perdida de cada barra operativa en una sola pasada.
+        Las cargas UPS de la barra perdida se transfieren a su barra secundaria
+        (o a la terciaria si la secundaria esta inactiva); el resto de cargas se pierde.
+
+        Retorna matrices indexadas por [barra perdida, ...]:
+          bar_load_kw (B×B), bar_current_a (B×B), station_load_kw (B×S),
+          transferred_kw (B), dropped_kw (B)
+        """
+        n_bars = len(self.bar_ids)
+        load = self.circuit_load
+        base = self.bar_load
+
+        # Barra alternativa de cada circuito UPS activo (-1 si no hay ninguna disponible)
+        sec_ok = (self.circuit_secondary >= 0) & self.bar_active[np.maximum(self.circuit_secondary, 0)]
+        ter_ok = (self.circuit_tertiary >= 0) & self.bar_active[np.maximum(self.circuit_tertiary, 0)]
+        alternate = np.where(sec_ok, self.circuit_secondary, np.where(ter_ok, self.circuit_tertiary, -1))
+        moves = self.circuit_is_ups & self.circuit_active & (alternate >= 0)
+
+        # transfer[k, j]: kW que pasan a la barra j cuando se pierde la barra k
+        transfer = np.zeros((n_bars, n_bars), dtype=np.float64)
+        np.add.at(transfer, (self.circuit_bar[moves], alternate[moves]), load[moves])
+
+        bar_load = base[None, :] + transfer
+        np.fill_diagonal(bar_load, 0.0)
+
+        transferred = transfer.sum(axis=1)
+        dropped = base - transferred
+
+        # Pertenencia barra → estacion para agregar por estacion con un producto matricial
+        membership = np.zeros((n_bars, len(self.station_ids)), dtype=np.float64)
+        membership[np.arange(n_bars), self.bar_station] = 1.0
+        station_load = bar_load @ membership
+
+        bar_current = bar_load * 1000.0 / (np.sqrt(3) * BAR_NOMINAL_VOLTAGE_V * BAR_POWER_FACTOR)
+
+        return {
+            "bar_load_kw": bar_load,
+            "bar_current_a": bar_current,
+            "station_load_kw": station_load,
+            "transferred_kw": transferred,
+            "dropped_kw": dropped,
+        }
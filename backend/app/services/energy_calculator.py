@@ -1,63 +1,218 @@
-from decimal import Decimal
-from sqlalchemy.orm import Session
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import select, update, union_all, func, case, and_, or_
+from sqlalchemy.orm import Session, aliased
 from app.models.station import Station
 from app.models.bar import Bar
 from app.models.circuit import Circuit
 from app.models.sub_circuit import SubCircuit
+from app.services.unit_of_work import mark_station_accounted, mark_stations_recalculated
+from app.services.realtime import publish_expr
+
+
+def demand_by_station(
+    station_ids: list[int] | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+):
+    """
+    Subconsulta agrupada con la demanda maxima de cada estacion:
+    SUM(md_kw) de circuitos no inactivos + sub-circuitos operativos de esos circuitos.
+    Las estaciones sin cargas devuelven 0 (LEFT JOIN).
+    Con start_date/end_date solo cuentan circuitos y sub-circuitos creados en el rango.
+    """
+    circuit_loads = (
+        select(Circuit.bar_id.label("bar_id"), Circuit.md_kw.label("md_kw"))
+        .where(Circuit.status != "inactive")
+    )
+    sub_loads = (
+        select(Circuit.bar_id.label("bar_id"), SubCircuit.md_kw.label("md_kw"))
+        .join(SubCircuit, SubCircuit.circuit_id == Circuit.id)
+        .where(Circuit.status != "inactive", SubCircuit.status == "operative_normal")
+    )
+    if start_date:
+        circuit_loads = circuit_loads.where(Circuit.created_at >= start_date)
+        sub_loads = sub_loads.where(
+            Circuit.created_at >= start_date, SubCircuit.created_at >= start_date
+        )
+    if end_date:
+        circuit_loads = circuit_loads.where(Circuit.created_at <= end_date)
+        sub_loads = sub_loads.where(
+            Circuit.created_at <= end_date, SubCircuit.created_at <= end_date
+        )
+    if station_ids is not None:
+        bar_ids = select(Bar.id).where(Bar.station_id.in_(station_ids))
+        circuit_loads = circuit_loads.where(Circuit.bar_id.in_(bar_ids))
+        sub_loads = sub_loads.where(Circuit.bar_id.in_(bar_ids))
+    loads = union_all(circuit_loads, sub_loads).subquery("loads")
+
+    st = aliased(Station)
+    query = (
+        select(
+            st.id.label("station_id"),
+            func.coalesce(func.sum(loads.c.md_kw), 0).label("total_md"),
+        )
+        .select_from(st)
+        .outerjoin(Bar, Bar.station_id == st.id)
+        .outerjoin(loads, loads.c.bar_id == Bar.id)
+        .group_by(st.id)
+    )
+    if station_ids is not None:
+        query = query.where(st.id.in_(station_ids))
+    return query.subquery("demand")
+
+
+def _status_case(capacity, available):
+    """Color de estado: rojo si no hay potencia disponible, amarillo bajo el 20%."""
+    return case(
+        (available < 0, "red"),
+        (and_(capacity > 0, available < capacity * Decimal("0.2")), "yellow"),
+        else_="green",
+    )
+
+
+def _update_station_demand(db: Session, stmt) -> None:
+    """
+    Ejecuta el UPDATE de demanda y, en la misma sentencia, publica los cambios de
+    color de estado. El alias prev (mismo registro en FROM) conserva el estado
+    anterior al UPDATE.
+    """
+    prev = Station.__table__.alias("prev")
+    updated = stmt.where(prev.c.id == Station.id).returning(
+        Station.id, Station.name, Station.status, prev.c.status.label("previous_status")
+    ).cte("updated")
+    data = func.json_build_object(
+        "station_id", updated.c.id,
+        "station_name", updated.c.name,
+        "status", updated.c.status,
+        "previous_status", updated.c.previous_status,
+    )
+    # El CTE se ejecuta completo aunque el SELECT solo retorne las estaciones que cambiaron
+    db.execute(
+        select(updated.c.id, publish_expr("station_status_changed", data))
+        .where(updated.c.status != updated.c.previous_status)
+    )
+
+
+def _kw(value) -> Decimal:
+    """Redondea a 2 decimales igual que la columna Numeric(10, 2) de PostgreSQL."""
+    return Decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
 class EnergyCalculator:
     def __init__(self, db: Session):
         self.db = db
 
+    def update_demand(self, station_ids: list[int] | None = None) -> None:
+        """
+        Recalcula max_demand_kw, available_power_kw y status en un solo UPDATE ... FROM,
+        sin confirmar la transaccion.
+        """
+        demand = demand_by_station(station_ids)
+        available = Station.transformer_capacity_kw - demand.c.total_md
+        stmt = (
+            update(Station)
+            .where(Station.id == demand.c.station_id)
+            .values(
+                max_demand_kw=demand.c.total_md,
+                available_power_kw=available,
+                status=_status_case(Station.transformer_capacity_kw, available),
+            )
+        )
+        _update_station_demand(self.db, stmt)
+        mark_stations_recalculated(self.db, station_ids)
+
     def recalculate_station(self, station_id: int) -> Station:
         station = self.db.query(Station).filter(Station.id == station_id).first()
         if not station:
             return None
 
-        bars = self.db.query(Bar).filter(Bar.station_id == station_id).all()
-        bar_ids = [b.id for b in bars]
-
-        total_md = Decimal("0")
-        if bar_ids:
-            circuits = (
-                self.db.query(Circuit)
-                .filter(Circuit.bar_id.in_(bar_ids))
-                .filter(Circuit.status != "inactive")
-                .all()
-            )
-            total_md = sum((c.md_kw for c in circuits), Decimal("0"))
-
-            # Also sum sub-circuits
-            circuit_ids = [c.id for c in circuits]
-            if circuit_ids:
-                sub_circuits = (
-                    self.db.query(SubCircuit)
-                    .filter(SubCircuit.circuit_id.in_(circuit_ids))
-                    .filter(SubCircuit.status == "operative_normal")
-                    .all()
-                )
-                total_md += sum((s.md_kw for s in sub_circuits), Decimal("0"))
-
-        station.max_demand_kw = total_md
-        station.available_power_kw = station.transformer_capacity_kw - total_md
-
-        # Determine status color
-        if station.available_power_kw < 0:
-            station.status = "red"
-        elif station.transformer_capacity_kw > 0:
-            ratio = station.available_power_kw / station.transformer_capacity_kw
-            if ratio < Decimal("0.2"):
-                station.status = "yellow"
-            else:
-                station.status = "green"
-        else:
-            station.status = "green"
+        self.update_demand([station_id])
 
         self.db.commit()
         self.db.refresh(station)
         return station
 
+    def recalculate_all_stations(self) -> None:
+        """Recalcula todas las estaciones con una unica sentencia agrupada."""
+        self.update_demand()
+        self.db.commit()
+
+    # ── Modo incremental ─────────────────────────────────────────────────────
+    # Las escrituras de circuitos/sub-circuitos aplican solo la diferencia de
+    # md_kw sobre la estacion, dentro de la misma transaccion que la escritura.
+    # reconcile() corrige periodicamente cualquier desviacion acumulada.
+
+    def circuit_load(self, circuit: Circuit) -> Decimal:
+        """Demanda que aporta un circuito a su estacion (incluye sus sub-circuitos operativos)."""
+        if circuit.status == "inactive":
+            return Decimal("0")
+        load = _kw(circuit.md_kw or 0)
+        if circuit.id is not None:
+            load += self.db.query(
+                func.coalesce(func.sum(SubCircuit.md_kw), 0)
+            ).filter(
+                SubCircuit.circuit_id == circuit.id,
+                SubCircuit.status == "operative_normal",
+            ).scalar()
+        return load
+
+    def sub_circuit_load(self, sub: SubCircuit, circuit: Circuit | None) -> Decimal:
+        """Demanda que aporta un sub-circuito (cero si el circuito padre esta inactivo)."""
+        if sub.status != "operative_normal" or circuit is None or circuit.status == "inactive":
+            return Decimal("0")
+        return _kw(sub.md_kw or 0)
+
+    def apply_delta(self, station_id: int, delta_md_kw: Decimal) -> None:
+        """Suma delta_md_kw a la demanda de la estacion sin confirmar la transaccion."""
+        mark_station_accounted(self.db, station_id)
+        if not delta_md_kw:
+            return
+        available = Station.available_power_kw - delta_md_kw
+        stmt = (
+            update(Station)
+            .where(Station.id == station_id)
+            .values(
+                max_demand_kw=Station.max_demand_kw + delta_md_kw,
+                available_power_kw=available,
+                status=_status_case(Station.transformer_capacity_kw, available),
+            )
+        )
+        _update_station_demand(self.db, stmt)
+
+    def reconcile(self) -> list[dict]:
+        """
+        Recalcula los totales desde cero, corrige las estaciones cuya demanda
+        almacenada difiere y retorna la lista de desviaciones encontradas.
+        """
+        demand = demand_by_station()
+        rows = self.db.execute(
+            select(Station.id, Station.name, Station.max_demand_kw, demand.c.total_md)
+            .join(demand, demand.c.station_id == Station.id)
+            .where(
+                or_(
+                    Station.max_demand_kw != demand.c.total_md,
+                    Station.available_power_kw
+                    != Station.transformer_capacity_kw - demand.c.total_md,
+                )
+            )
+        ).all()
+
+        drift = [
+            {
+                "station_id": station_id,
+                "station_name": name,
+                "stored_md_kw": float(stored),
+                "actual_md_kw": float(actual),
+                "drift_kw": float(stored - actual),
+            }
+            for station_id, name, stored, actual in rows
+        ]
+        if drift:
+            self.update_demand([d["station_id"] for d in drift])
+            self.db.commit()
+        return drift
+
     def check_capacity(self, bar_id: int, new_md_kw: Decimal) -> dict:
         """Check if adding new_md_kw to a bar's station would exceed capacity."""
         bar = self.db.query(Bar).filter(Bar.id == bar_id).first()
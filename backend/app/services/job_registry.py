@@ -0,0 +1,84 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Iterator
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from app.database import SessionLocal
+from app.models.job_run import JobRun
+
+
+class JobRegistry:
+    """
+    Registro de jobs programados sobre un BackgroundScheduler. Cada ejecucion se
+    guarda en job_runs con su duracion, las filas revisadas/escritas que informe
+    el job (retornando {"rows_scanned": n, "rows_inserted": m}) y el error si fallo.
+    """
+
+    def __init__(self):
+        self._jobs: dict[str, tuple[Callable[[], dict | None], str, dict]] = {}
+        self._scheduler: BackgroundScheduler | None = None
+
+    def add_job(self, name: str, func: Callable[[], dict | None], trigger: str, **trigger_args) -> None:
+        self._jobs[name] = (func, trigger, trigger_args)
+
+    def start(self) -> None:
+        if self._scheduler is not None:
+            return
+        self._scheduler = BackgroundScheduler()
+        for name, (_, trigger, trigger_args) in self._jobs.items():
+            self._scheduler.add_job(self.run, trigger, args=[name], id=name, **trigger_args)
+        self._scheduler.start()
+
+    def shutdown(self) -> None:
+        if self._scheduler is None:
+            return
+        self._scheduler.shutdown(wait=False)
+        self._scheduler = None
+
+    def run(self, name: str) -> None:
+        """Ejecuta el job y registra la ejecucion; los errores quedan en job_runs."""
+        func = self._jobs[name][0]
+        try:
+            with self.track(name) as stats:
+                stats.update(func() or {})
+        except Exception as e:
+            print(f"[JOBS] {name} fallo: {e}")
+
+    @contextmanager
+    def track(self, name: str) -> Iterator[dict]:
+        """Mide el bloque y lo registra en job_runs (tambien si falla; el error se propaga)."""
+        stats: dict = {}
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield stats
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            duration_ms = int((time.perf_counter() - start) * 1000)
+            self._record(name, started_at, duration_ms, stats, error)
+
+    def _record(self, name: str, started_at: datetime, duration_ms: int, stats: dict, error: str | None) -> None:
+        db = SessionLocal()
+        try:
+            db.add(JobRun(
+                job_name=name,
+                started_at=started_at,
+                duration_ms=duration_ms,
+                rows_scanned=stats.get("rows_scanned"),
+                rows_inserted=stats.get("rows_inserted"),
+                error=error,
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[JOBS] No se pudo registrar la ejecucion de {name}: {e}")
+        finally:
+            db.close()
+
+
+job_registry = JobRegistry()
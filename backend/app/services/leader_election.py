@@ -0,0 +1,133 @@
+import select as select_io
+import threading
+from typing import Callable
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import engine
+
+
+class LeaderElection:
+    """
+    Eleccion de lider entre procesos (workers de uvicorn o replicas) con un
+    advisory lock de sesion de PostgreSQL. El proceso que obtiene el lock ejecuta
+    on_elected y lo conserva mientras su conexion siga viva; si el proceso muere,
+    PostgreSQL libera el lock y otro lo toma en el siguiente intento.
+    La conexion del lider ademas escucha (LISTEN) los canales registrados con listen().
+    """
+
+    def __init__(self, lock_key: int, poll_interval_s: float):
+        self._lock_key = lock_key
+        self._poll_interval_s = poll_interval_s
+        self._channels: dict[str, Callable[[str], None]] = {}
+        self._on_elected: Callable[[], None] | None = None
+        self._on_demoted: Callable[[], None] | None = None
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._conn is not None
+
+    def listen(self, channel: str, handler: Callable[[str], None]) -> None:
+        """Registra un handler para los NOTIFY del canal (solo se invoca en el lider)."""
+        self._channels[channel] = handler
+
+    def start(self, on_elected: Callable[[], None], on_demoted: Callable[[], None]) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler-leader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detiene los jobs (si es lider) y libera el lock."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._conn is None:
+                self._try_acquire()
+                if self._conn is None:
+                    self._stop.wait(self._poll_interval_s)
+                continue
+            try:
+                self._wait_notifications()
+            except Exception as e:
+                print(f"[LEADER] Conexion del lider perdida: {e}")
+                self._demote()
+        if self._conn is not None:
+            self._demote(release=True)
+
+    def _try_acquire(self) -> None:
+        conn = None
+        try:
+            conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            acquired = conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self._lock_key}
+            ).scalar()
+            if not acquired:
+                conn.close()
+                return
+            for channel in self._channels:
+                conn.execute(text(f'LISTEN "{channel}"'))
+        except Exception as e:
+            print(f"[LEADER] No se pudo intentar la eleccion: {e}")
+            if conn is not None:
+                conn.invalidate()
+                conn.close()
+            return
+
+        self._conn = conn
+        print("[LEADER] Este proceso ejecuta los jobs programados")
+        try:
+            self._on_elected()
+        except Exception as e:
+            print(f"[LEADER] Error al iniciar los jobs: {e}")
+
+    def _wait_notifications(self) -> None:
+        """Espera NOTIFY hasta poll_interval_s; sin eventos, verifica que la conexion siga viva."""
+        raw = self._conn.connection.driver_connection
+        ready, _, _ = select_io.select([raw], [], [], self._poll_interval_s)
+        if not ready:
+            self._conn.execute(text("SELECT 1"))
+            return
+        raw.poll()
+        while raw.notifies:
+            notify = raw.notifies.pop(0)
+            handler = self._channels.get(notify.channel)
+            if handler is None:
+                continue
+            try:
+                handler(notify.payload)
+            except Exception as e:
+                print(f"[LEADER] Error en el canal {notify.channel}: {e}")
+
+    def _demote(self, release: bool = False) -> None:
+        try:
+            self._on_demoted()
+        except Exception as e:
+            print(f"[LEADER] Error al detener los jobs: {e}")
+        conn, self._conn = self._conn, None
+        try:
+            if release:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self._lock_key})
+        except Exception as e:
+            print(f"[LEADER] No se pudo liberar el lock: {e}")
+        # La conexion no vuelve al pool: conserva LISTEN y, si no se libero, el lock
+        conn.invalidate()
+        conn.close()
+
+
+scheduler_leader = LeaderElection(
+    lock_key=settings.SCHEDULER_LOCK_KEY,
+    poll_interval_s=settings.SCHEDULER_LEADER_POLL_S,
+)
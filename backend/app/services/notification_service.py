@@ -1,148 +1,190 @@
 from datetime import date
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select, update, union_all, exists, or_, func, case, cast, literal, false, text, String
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
 
+from app.models.bar import Bar
 from app.models.circuit import Circuit
 from app.models.sub_circuit import SubCircuit
 from app.models.notification import Notification
+from app.services.realtime import publish_expr
 
+RESERVE_STATUSES = ("reserve_r", "reserve_equipped_re")
 
-def _has_active_notification(db: Session, circuit_id: int, today: date) -> bool:
-    """Retorna True si ya existe una notificacion reserve_no_contact activa para este circuito."""
-    return (
-        db.query(Notification)
-        .filter(
-            Notification.circuit_id == circuit_id,
-            Notification.type == "reserve_no_contact",
-            Notification.is_dismissed == False,
-        )
-        .filter(
-            (Notification.extended_until == None)
-            | (Notification.extended_until > today)
-        )
-        .first()
-        is not None
+# Predicado del indice unico parcial: una sola notificacion de reserva sin descartar por circuito
+ACTIVE_RESERVE_PREDICATE = text("type = 'reserve_no_contact' AND NOT is_dismissed")
+
+
+def _active_notification(today: date):
+    """EXISTS de una notificacion reserve_no_contact activa (sin descartar y sin extension vigente vencida)."""
+    return exists().where(
+        Notification.circuit_id == Circuit.id,
+        Notification.type == "reserve_no_contact",
+        Notification.is_dismissed == false(),
+        or_(Notification.extended_until.is_(None), Notification.extended_until > today),
     )
 
 
-def _make_message(name: str, expires_at: date, today: date) -> str:
-    days_overdue = (today - expires_at).days
-    if days_overdue <= 0:
-        return (
-            f"La reserva del circuito {name} vence hoy ({expires_at}). "
-            f"Puede extender el plazo o eliminar la reserva."
+def _expired_message(name, expires_at, today: date):
+    """Version SQL del mensaje de reserva vencida (vence hoy / vencio hace N dias)."""
+    days_overdue = literal(today) - expires_at
+    expires_text = cast(expires_at, String)
+    return case(
+        (
+            days_overdue <= 0,
+            "La reserva del circuito " + name + " vence hoy (" + expires_text + "). "
+            "Puede extender el plazo o eliminar la reserva.",
+        ),
+        else_=(
+            "La reserva del circuito " + name + " venció hace " + cast(days_overdue, String)
+            + " día(s) (fecha límite: " + expires_text + "). "
+            "Puede extender el plazo o eliminar la reserva."
+        ),
+    )
+
+
+def _insert_notifications(db: Session, rows) -> int:
+    """
+    INSERT ... SELECT de notificaciones; los circuitos con una activa se omiten
+    (ON CONFLICT). Publica cada notificacion creada en /ws/notifications en la
+    misma sentencia (CTE con pg_notify por fila).
+    """
+    stmt = (
+        insert(Notification)
+        .from_select(
+            ["circuit_id", "station_id", "type", "message", "is_read", "is_dismissed", "created_at"],
+            select(
+                rows.c.circuit_id,
+                rows.c.station_id,
+                literal("reserve_no_contact"),
+                rows.c.message,
+                false(),
+                false(),
+                func.now(),
+            ),
+        )
+        .on_conflict_do_nothing(index_elements=["circuit_id"], index_where=ACTIVE_RESERVE_PREDICATE)
+        .returning(
+            Notification.id, Notification.station_id, Notification.circuit_id,
+            Notification.type, Notification.message, Notification.created_at,
         )
-    return (
-        f"La reserva del circuito {name} venció hace {days_overdue} día(s) (fecha límite: {expires_at}). "
-        f"Puede extender el plazo o eliminar la reserva."
     )
+    created = stmt.cte("created")
+    published = select(
+        created.c.id,
+        publish_expr("notification_created", func.row_to_json(created.table_valued())),
+    )
+    return len(db.execute(published).all())
 
 
-def check_expiring_reserves(db: Session) -> None:
+def check_expiring_reserves(db: Session, circuit_ids: list[int] | None = None) -> int:
+    """
+    Genera las notificaciones de reservas vencidas con sentencias por conjuntos
+    (unas pocas consultas sin importar el volumen). Con circuit_ids solo revisa
+    esos circuitos (y sus sub-circuitos). Retorna cuantas se crearon; si falla,
+    la excepcion se propaga y el llamador hace rollback.
+    """
     today = date.today()
+    only = circuit_ids is not None
 
-    # ── Caso 1: Circuitos con reserve_expires_at <= hoy ──────────────────────
-    circuits = (
-        db.query(Circuit)
-        .options(joinedload(Circuit.bar))
-        .filter(
-            Circuit.status.in_(["reserve_r", "reserve_equipped_re"]),
-            Circuit.reserve_expires_at.isnot(None),
-            Circuit.reserve_expires_at <= today,
+    # ── Extensiones vencidas: se descarta la notificacion y se crea una nueva ──
+    # (<= hoy: tambien recupera dias en que el job no corrio)
+    # Circuitos en reserva o con algun sub-circuito en reserva (el padre puede seguir operativo)
+    reserved_circuits = select(Circuit.id).where(Circuit.status.in_(RESERVE_STATUSES))
+    reserved_subs = select(SubCircuit.circuit_id).where(SubCircuit.status.in_(RESERVE_STATUSES))
+    if only:
+        reserved_circuits = reserved_circuits.where(Circuit.id.in_(circuit_ids))
+        reserved_subs = reserved_subs.where(SubCircuit.circuit_id.in_(circuit_ids))
+    reserved = union_all(reserved_circuits, reserved_subs)
+    expired_extensions = db.execute(
+        update(Notification)
+        .where(
+            Notification.type == "reserve_no_contact",
+            Notification.is_dismissed == false(),
+            Notification.extended_until <= today,
+            Notification.circuit_id.in_(reserved),
         )
-        .all()
-    )
+        .values(is_dismissed=True)
+        .returning(Notification.circuit_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
 
-    for circuit in circuits:
-        try:
-            if _has_active_notification(db, circuit.id, today):
-                continue
-            name = circuit.name or circuit.denomination
-            bar = circuit.bar
-            station_id = bar.station_id if bar else None
-            db.add(
-                Notification(
-                    circuit_id=circuit.id,
-                    station_id=station_id,
-                    type="reserve_no_contact",
-                    message=_make_message(name, circuit.reserve_expires_at, today),
-                )
+    created = 0
+    if expired_extensions:
+        name = func.coalesce(func.nullif(Circuit.name, ""), Circuit.denomination)
+        rows = (
+            select(
+                Circuit.id.label("circuit_id"),
+                Bar.station_id.label("station_id"),
+                (
+                    "La extensión de reserva del circuito " + name + " venció hoy ("
+                    + cast(literal(today), String) + "). "
+                    "Puede extender nuevamente o eliminar la reserva."
+                ).label("message"),
             )
-        except Exception:
-            continue
-
-    # ── Caso 2: Sub-circuitos con reserve_expires_at <= hoy ──────────────────
-    sub_circuits = (
-        db.query(SubCircuit)
-        .options(joinedload(SubCircuit.circuit).joinedload(Circuit.bar))
-        .filter(
-            SubCircuit.status.in_(["reserve_r", "reserve_equipped_re"]),
-            SubCircuit.reserve_expires_at.isnot(None),
+            .outerjoin(Bar, Circuit.bar_id == Bar.id)
+            .where(Circuit.id.in_(set(expired_extensions)))
+            .subquery()
+        )
+        created += _insert_notifications(db, rows)
+
+    # ── Circuitos y sub-circuitos con reserve_expires_at <= hoy ──────────────
+    # Anti-join contra notificaciones activas; una notificacion por circuito
+    # (si vence el circuito y un sub-circuito, se informa el circuito)
+    circuit_name = func.coalesce(func.nullif(Circuit.name, ""), Circuit.denomination)
+    expired_circuits = select(
+        Circuit.id.label("circuit_id"),
+        Circuit.bar_id.label("bar_id"),
+        _expired_message(circuit_name, Circuit.reserve_expires_at, today).label("message"),
+        literal(0).label("priority"),
+    ).where(
+        Circuit.status.in_(RESERVE_STATUSES),
+        Circuit.reserve_expires_at <= today,
+        ~_active_notification(today),
+    )
+    expired_subs = (
+        select(
+            Circuit.id.label("circuit_id"),
+            Circuit.bar_id.label("bar_id"),
+            _expired_message("sub-circuito " + SubCircuit.name, SubCircuit.reserve_expires_at, today).label("message"),
+            literal(1).label("priority"),
+        )
+        .join(Circuit, SubCircuit.circuit_id == Circuit.id)
+        .where(
+            SubCircuit.status.in_(RESERVE_STATUSES),
             SubCircuit.reserve_expires_at <= today,
+            ~_active_notification(today),
         )
-        .all()
     )
+    if only:
+        expired_circuits = expired_circuits.where(Circuit.id.in_(circuit_ids))
+        expired_subs = expired_subs.where(SubCircuit.circuit_id.in_(circuit_ids))
+    candidates = union_all(expired_circuits, expired_subs).subquery("candidates")
+    rows = (
+        select(candidates.c.circuit_id, Bar.station_id.label("station_id"), candidates.c.message)
+        .outerjoin(Bar, candidates.c.bar_id == Bar.id)
+        .distinct(candidates.c.circuit_id)
+        .order_by(candidates.c.circuit_id, candidates.c.priority)
+        .subquery()
+    )
+    created += _insert_notifications(db, rows)
 
-    for sub in sub_circuits:
-        try:
-            if _has_active_notification(db, sub.circuit_id, today):
-                continue
-            name = sub.name
-            circuit = sub.circuit
-            bar = circuit.bar if circuit else None
-            station_id = bar.station_id if bar else None
-            db.add(
-                Notification(
-                    circuit_id=sub.circuit_id,
-                    station_id=station_id,
-                    type="reserve_no_contact",
-                    message=_make_message(f"sub-circuito {name}", sub.reserve_expires_at, today),
-                )
-            )
-        except Exception:
-            continue
+    db.commit()
+    return created
 
-    # ── Caso 3: Notificaciones con extended_until == hoy → crear nueva ────────
-    expiring_extended = (
-        db.query(Notification)
-        .filter(
-            Notification.type == "reserve_no_contact",
-            Notification.extended_until == today,
-            Notification.is_dismissed == False,
-        )
-        .all()
-    )
 
-    for notif in expiring_extended:
-        try:
-            if not notif.circuit_id:
-                continue
-            circuit = (
-                db.query(Circuit)
-                .options(joinedload(Circuit.bar))
-                .filter(Circuit.id == notif.circuit_id)
-                .first()
-            )
-            if circuit and circuit.status in ("reserve_r", "reserve_equipped_re"):
-                notif.is_dismissed = True
-                name = circuit.name or circuit.denomination
-                bar = circuit.bar
-                station_id = bar.station_id if bar else None
-                db.add(
-                    Notification(
-                        circuit_id=circuit.id,
-                        station_id=station_id,
-                        type="reserve_no_contact",
-                        message=(
-                            f"La extensión de reserva del circuito {name} venció hoy ({today}). "
-                            f"Puede extender nuevamente o eliminar la reserva."
-                        ),
-                    )
-                )
-        except Exception:
-            continue
-
-    try:
-        db.commit()
-    except Exception:
-        db.rollback()
+def dismiss_duplicate_reserve_notifications(engine: Engine) -> None:
+    """
+    Deja una sola notificacion reserve_no_contact sin descartar por circuito (la
+    mas reciente), requisito para crear el indice unico parcial.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE notifications n SET is_dismissed = true "
+            "WHERE n.type = 'reserve_no_contact' AND NOT n.is_dismissed AND n.circuit_id IS NOT NULL "
+            "AND EXISTS (SELECT 1 FROM notifications m "
+            "WHERE m.circuit_id = n.circuit_id AND m.type = 'reserve_no_contact' "
+            "AND NOT m.is_dismissed AND m.id > n.id)"
+        ))
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import select as select_io
+import threading
+
+from sqlalchemy import select, func, text, cast, Text
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.utils.websocket_manager import manager
+
+# Canal NOTIFY de PostgreSQL compartido por todos los workers
+EVENTS_CHANNEL = "app_events"
+# Canal del ConnectionManager al que se suscribe /ws/notifications
+NOTIFICATIONS_WS_CHANNEL = "notifications"
+
+_RECONNECT_S = 5.0
+
+
+def publish(db: Session, event_type: str, data: dict) -> None:
+    """
+    Publica un evento para los clientes de /ws/notifications. Se envia con
+    pg_notify en la transaccion de db: solo se entrega si confirma, y llega a
+    todos los workers (cada uno lo reenvia a sus conexiones).
+    """
+    payload = json.dumps({"type": event_type, "data": data}, default=str)
+    db.execute(select(func.pg_notify(EVENTS_CHANNEL, payload)))
+
+
+def publish_expr(event_type: str, data):
+    """
+    Version SQL de publish() para una expresion JSON por fila (p. ej.
+    row_to_json de un CTE INSERT ... RETURNING): publica un evento por fila
+    dentro de la misma sentencia.
+    """
+    payload = func.json_build_object("type", event_type, "data", data)
+    return func.pg_notify(EVENTS_CHANNEL, cast(payload, Text))
+
+
+class EventRelay:
+    """
+    Hilo por worker que escucha EVENTS_CHANNEL con una conexion dedicada y
+    reenvia cada evento a los WebSocket conectados a este proceso.
+    """
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._loop = loop
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+                conn.execute(text(f'LISTEN "{EVENTS_CHANNEL}"'))
+                raw = conn.connection.driver_connection
+                while not self._stop.is_set():
+                    ready, _, _ = select_io.select([raw], [], [], 1.0)
+                    if not ready:
+                        continue
+                    raw.poll()
+                    while raw.notifies:
+                        self._dispatch(raw.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"[EVENTS] Conexion de eventos perdida: {e}")
+                self._stop.wait(_RECONNECT_S)
+            finally:
+                if conn is not None:
+                    # No vuelve al pool: conserva LISTEN
+                    conn.invalidate()
+                    conn.close()
+
+    def _dispatch(self, payload: str) -> None:
+        if not manager.active_connections.get(NOTIFICATIONS_WS_CHANNEL):
+            return
+        asyncio.run_coroutine_threadsafe(
+            manager.broadcast(NOTIFICATIONS_WS_CHANNEL, json.loads(payload)), self._loop
+        )
+
+
+event_relay = EventRelay()
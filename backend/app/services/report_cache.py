@@ -0,0 +1,106 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.report_cache import ReportCache, ReportDataVersion
+
+# last_accessed_at se actualiza como maximo una vez por minuto por entrada (precision del LRU)
+_TOUCH_INTERVAL = timedelta(minutes=1)
+
+
+def current_data_version(db: Session) -> int:
+    """Version global de los datos; cambia con cada commit que modifica datos de reportes."""
+    return db.scalar(select(ReportDataVersion.version).where(ReportDataVersion.id == 1)) or 0
+
+
+def bump_data_version(db: Session) -> None:
+    """
+    Invalida todas las entradas del cache (se llama desde la unidad de trabajo).
+    El UPDATE es transaccional: otra sesion sigue viendo la version anterior hasta
+    el commit, por lo que nunca guarda datos viejos bajo la version nueva.
+    """
+    stmt = insert(ReportDataVersion).values(id=1, version=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[ReportDataVersion.id],
+        set_={"version": ReportDataVersion.version + 1},
+    ))
+
+
+def cache_key(endpoint: str, params: dict) -> str:
+    raw = json.dumps({"endpoint": endpoint, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def get_or_compute(
+    db: Session,
+    endpoint: str,
+    params: dict,
+    compute: Callable[[], bytes],
+    media_type: str,
+) -> bytes:
+    """
+    Retorna el payload cacheado para (endpoint, params) si fue generado con la
+    version de datos actual; si no, lo calcula y lo guarda en la tabla report_cache,
+    compartida por todos los workers. El cache se limita a REPORT_CACHE_MAX_ENTRIES
+    entradas, descartando las menos usadas recientemente.
+    """
+    key = cache_key(endpoint, params)
+    version = current_data_version(db)
+    now = datetime.now(timezone.utc)
+
+    entry = db.get(ReportCache, key)
+    if entry and entry.data_version == version:
+        if now - entry.last_accessed_at > _TOUCH_INTERVAL:
+            db.execute(
+                update(ReportCache)
+                .where(ReportCache.cache_key == key)
+                .values(last_accessed_at=now)
+            )
+            db.commit()
+        return entry.payload
+
+    payload = compute()
+    stmt = insert(ReportCache).values(
+        cache_key=key,
+        endpoint=endpoint,
+        data_version=version,
+        media_type=media_type,
+        payload=payload,
+        size_bytes=len(payload),
+        created_at=now,
+        last_accessed_at=now,
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ReportCache.cache_key],
+            set_={
+                "data_version": stmt.excluded.data_version,
+                "payload": stmt.excluded.payload,
+                "size_bytes": stmt.excluded.size_bytes,
+                "created_at": stmt.excluded.created_at,
+                "last_accessed_at": stmt.excluded.last_accessed_at,
+            },
+        )
+    )
+    _evict(db)
+    db.commit()
+    return payload
+
+
+def _evict(db: Session) -> None:
+    """Elimina las entradas que exceden el limite, las menos usadas primero."""
+    overflow = (
+        select(ReportCache.cache_key)
+        .order_by(ReportCache.last_accessed_at.desc())
+        .offset(settings.REPORT_CACHE_MAX_ENTRIES)
+    )
+    db.execute(
+        delete(ReportCache).where(ReportCache.cache_key.in_(overflow)),
+        execution_options={"synchronize_session": False},
+    )
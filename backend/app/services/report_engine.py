@@ -0,0 +1,286 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, func, cast, union_all, literal, false, DateTime
+from sqlalchemy.orm import Session
+
+from app.models.station import Station
+from app.models.bar import Bar
+from app.models.circuit import Circuit
+from app.models.sub_circuit import SubCircuit
+from app.models.request import Request
+from app.models.station_demand_snapshot import StationDemandSnapshot
+from app.services.energy_calculator import demand_by_station
+
+
+def station_demand(
+    db: Session,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+) -> list[dict]:
+    """
+    Demanda por estacion. Sin rango de fechas retorna los valores actuales de cada
+    estacion; con rango retorna la ultima foto diaria (station_demand_snapshots)
+    de cada estacion dentro del rango. Las estaciones sin fotos en el rango (p. ej.
+    rangos anteriores a la primera foto) usan la demanda de circuitos/sub-circuitos
+    creados en el rango.
+    """
+    if not start_date and not end_date:
+        stations = db.query(Station).order_by(Station.order_index).all()
+        return [
+            {
+                "station_id": station.id,
+                "station_name": station.name,
+                "station_code": station.code,
+                "transformer_capacity_kw": float(station.transformer_capacity_kw),
+                "max_demand_kw": float(station.max_demand_kw),
+                "available_power_kw": float(station.available_power_kw),
+                "status": station.status,
+            }
+            for station in stations
+        ]
+
+    latest = _latest_snapshots(
+        start_date.date() if start_date else None,
+        end_date.date() if end_date else None,
+    )
+    demand = demand_by_station(start_date=start_date, end_date=end_date)
+    rows = db.execute(
+        select(
+            Station.id, Station.name, Station.code, Station.transformer_capacity_kw, Station.status,
+            demand.c.total_md,
+            latest.c.snapshot_date,
+            latest.c.transformer_capacity_kw.label("snapshot_capacity_kw"),
+            latest.c.max_demand_kw,
+            latest.c.status.label("snapshot_status"),
+        )
+        .join(demand, demand.c.station_id == Station.id)
+        .outerjoin(latest, latest.c.station_id == Station.id)
+        .order_by(Station.order_index)
+    ).all()
+
+    data = []
+    for row in rows:
+        if row.snapshot_date is None:
+            capacity, md, status = float(row.transformer_capacity_kw), float(row.total_md), row.status
+        else:
+            capacity = float(row.snapshot_capacity_kw)
+            md, status = float(row.max_demand_kw), row.snapshot_status
+        data.append({
+            "station_id": row.id,
+            "station_name": row.name,
+            "station_code": row.code,
+            "transformer_capacity_kw": capacity,
+            "max_demand_kw": md,
+            "available_power_kw": capacity - md,
+            "status": status,
+        })
+    return data
+
+
+def _latest_snapshots(start: date | None, end: date | None, *extra_keys):
+    """
+    Subconsulta con la ultima foto de cada estacion (y de cada extra_keys, p. ej.
+    el periodo) entre start y end: DISTINCT ON ... ORDER BY snapshot_date DESC.
+    """
+    snap = StationDemandSnapshot
+    query = select(
+        snap.station_id, snap.snapshot_date, snap.transformer_capacity_kw,
+        snap.max_demand_kw, snap.available_power_kw, snap.status, *extra_keys,
+    )
+    if start:
+        query = query.where(snap.snapshot_date >= start)
+    if end:
+        query = query.where(snap.snapshot_date <= end)
+    keys = [snap.station_id, *extra_keys]
+    return (
+        query.distinct(*keys)
+        .order_by(*keys, snap.snapshot_date.desc())
+        .subquery("latest")
+    )
+
+
+SERIES_BUCKETS = ("day", "week", "month")
+
+
+def _period_start(day: date, bucket: str) -> date:
+    """Igual que date_trunc(bucket, day) de PostgreSQL (semanas desde el lunes)."""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _snapshot_series(db: Session, bucket: str, start: date | None, end: date | None):
+    """
+    (valor inicial, valores por periodo) desde las fotos diarias: cada periodo toma
+    la ultima foto de la estacion en el periodo; el valor inicial es la ultima foto
+    anterior al primer periodo del rango.
+    """
+    baseline: dict[int, float] = {}
+    if start:
+        start = _period_start(start, bucket)
+        before = _latest_snapshots(None, start - timedelta(days=1))
+        baseline = {
+            station_id: float(md)
+            for station_id, md in db.execute(select(before.c.station_id, before.c.max_demand_kw))
+        }
+
+    period = func.date_trunc(bucket, cast(StationDemandSnapshot.snapshot_date, DateTime)).label("period")
+    latest = _latest_snapshots(start, end, period)
+    by_period: dict[date, dict[int, float]] = {}
+    for station_id, p, md in db.execute(
+        select(latest.c.station_id, latest.c.period, latest.c.max_demand_kw)
+    ):
+        by_period.setdefault(p.date(), {})[station_id] = float(md)
+    return baseline, by_period
+
+
+def _created_at_series(
+    db: Session,
+    bucket: str,
+    start_date: datetime | None,
+    end_date: datetime | None,
+):
+    """
+    (valor inicial, valores por periodo) acumulando circuitos/sub-circuitos por
+    created_at con date_trunc y SUM() OVER por estacion. Se usa para los
+    periodos anteriores a la primera foto diaria.
+    """
+    circuit_loads = (
+        select(
+            Bar.station_id.label("station_id"),
+            Circuit.created_at.label("created_at"),
+            Circuit.md_kw.label("md_kw"),
+        )
+        .join(Circuit, Circuit.bar_id == Bar.id)
+        .where(Circuit.status != "inactive")
+    )
+    sub_loads = (
+        select(
+            Bar.station_id.label("station_id"),
+            SubCircuit.created_at.label("created_at"),
+            SubCircuit.md_kw.label("md_kw"),
+        )
+        .join(Circuit, Circuit.bar_id == Bar.id)
+        .join(SubCircuit, SubCircuit.circuit_id == Circuit.id)
+        .where(Circuit.status != "inactive", SubCircuit.status == "operative_normal")
+    )
+    if end_date:
+        circuit_loads = circuit_loads.where(Circuit.created_at <= end_date)
+        sub_loads = sub_loads.where(SubCircuit.created_at <= end_date)
+    loads = union_all(circuit_loads, sub_loads).subquery("loads")
+
+    period = func.date_trunc(bucket, loads.c.created_at).label("period")
+    per_period = (
+        select(loads.c.station_id, period, func.sum(loads.c.md_kw).label("md_kw"))
+        .group_by(loads.c.station_id, period)
+        .subquery("per_period")
+    )
+    cumulative = func.sum(per_period.c.md_kw).over(
+        partition_by=per_period.c.station_id, order_by=per_period.c.period
+    )
+    before_range = false()
+    if start_date:
+        start = literal(start_date, DateTime(timezone=True))
+        before_range = per_period.c.period < func.date_trunc(bucket, start)
+    rows = db.execute(
+        select(per_period.c.station_id, per_period.c.period, cumulative, before_range)
+        .order_by(per_period.c.period)
+    ).all()
+
+    # Acumulado previo al rango y valores por periodo dentro del rango
+    baseline: dict[int, float] = {}
+    by_period: dict[date, dict[int, float]] = {}
+    for station_id, p, total, is_before in rows:
+        if is_before:
+            baseline[station_id] = float(total)
+        else:
+            by_period.setdefault(p.date(), {})[station_id] = float(total)
+    return baseline, by_period
+
+
+def station_demand_series(
+    db: Session,
+    bucket: str,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+) -> list[dict]:
+    """
+    Demanda por estacion y periodo (day/week/month). Desde el periodo de la primera
+    foto diaria se leen las fotos (station_demand_snapshots); los periodos
+    anteriores se calculan acumulando created_at de circuitos y sub-circuitos.
+    Los periodos sin cambios repiten el valor anterior para alinear las series.
+    """
+    if bucket not in SERIES_BUCKETS:
+        raise ValueError(f"Periodo invalido: {bucket}. Use day, week o month")
+
+    start = start_date.date() if start_date else None
+    end = end_date.date() if end_date else None
+    first_snapshot = db.scalar(select(func.min(StationDemandSnapshot.snapshot_date)))
+    cutoff = _period_start(first_snapshot, bucket) if first_snapshot else None
+
+    baseline: dict[int, float] = {}
+    by_period: dict[date, dict[int, float]] = {}
+    # Tramo sin fotos: created_at hasta el periodo de la primera foto (exclusive)
+    if cutoff is None or start is None or _period_start(start, bucket) < cutoff:
+        baseline, history = _created_at_series(db, bucket, start_date, end_date)
+        by_period.update({p: v for p, v in history.items() if cutoff is None or p < cutoff})
+    # Tramo con fotos
+    if cutoff is not None and (end is None or end >= cutoff):
+        snapshot_baseline, snapshots = _snapshot_series(db, bucket, start, end)
+        if start is not None and _period_start(start, bucket) >= cutoff:
+            baseline = snapshot_baseline
+        by_period.update(snapshots)
+
+    periods = sorted(by_period)
+    stations = db.query(Station).order_by(Station.order_index).all()
+    data = []
+    for station in stations:
+        capacity = float(station.transformer_capacity_kw)
+        current = baseline.get(station.id, 0.0)
+        series = []
+        for p in periods:
+            current = by_period[p].get(station.id, current)
+            series.append({
+                "period": p.isoformat(),
+                "max_demand_kw": current,
+                "available_power_kw": capacity - current,
+            })
+        data.append({
+            "station_id": station.id,
+            "station_name": station.name,
+            "station_code": station.code,
+            "transformer_capacity_kw": capacity,
+            "series": series,
+        })
+    return data
+
+
+def requests_per_station(
+    db: Session,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+) -> list[dict]:
+    """Cantidad de solicitudes por estacion y estado (una consulta agrupada)."""
+    query = db.query(
+        Request.station_id,
+        Station.name,
+        Request.status,
+        func.count(Request.id).label("count"),
+    ).join(Station, Request.station_id == Station.id)
+
+    if start_date:
+        query = query.filter(Request.created_at >= start_date)
+    if end_date:
+        query = query.filter(Request.created_at <= end_date)
+
+    results = query.group_by(Request.station_id, Station.name, Request.status).all()
+
+    data = {}
+    for station_id, station_name, status, count in results:
+        if station_name not in data:
+            data[station_name] = {"station_id": station_id, "station_name": station_name, "pending": 0, "approved": 0, "rejected": 0}
+        data[station_name][status] = count
+
+    return list(data.values())
@@ -0,0 +1,233 @@
+import heapq
+import json
+import threading
+from datetime import date, datetime, time
+from itertools import chain
+
+from sqlalchemy import event, select, union_all, false, func, exists, or_
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.circuit import Circuit
+from app.models.sub_circuit import SubCircuit
+from app.models.notification import Notification
+from app.services.notification_service import RESERVE_STATUSES, check_expiring_reserves
+from app.services.job_registry import job_registry
+
+# Clave en session.info con los vencimientos escritos en la transaccion
+_PENDING_DEADLINES = "reserve_pending_deadlines"
+
+# Canal NOTIFY con los vencimientos escritos en procesos que no ejecutan el planificador
+RESERVE_DEADLINES_CHANNEL = "reserve_deadlines"
+# Entradas por NOTIFY (el payload de PostgreSQL se limita a 8000 bytes)
+_NOTIFY_CHUNK = 200
+
+# Espera maxima del hilo: acota el desfase si cambia el reloj del sistema
+_MAX_WAIT_S = 3600
+
+
+def _due_at(deadline: date) -> datetime:
+    return datetime.combine(deadline, time(hour=settings.RESERVE_CHECK_HOUR))
+
+
+def _pending_deadline(deadline_col, circuit_id_col, today: date):
+    """
+    Vencimientos futuros, o pasados cuyo circuito no tiene una notificacion activa
+    (las reservas vencidas ya notificadas no se vuelven a encolar).
+    """
+    active = aliased(Notification)
+    notified = exists().where(
+        active.circuit_id == circuit_id_col,
+        active.type == "reserve_no_contact",
+        active.is_dismissed == false(),
+        or_(active.extended_until.is_(None), active.extended_until > today),
+    )
+    return or_(deadline_col > today, ~notified)
+
+
+def _deadlines_query():
+    """(fecha, circuit_id) de reservas y extensiones pendientes; cada rama usa su indice parcial."""
+    today = date.today()
+    circuits = select(Circuit.reserve_expires_at, Circuit.id).where(
+        Circuit.status.in_(RESERVE_STATUSES),
+        Circuit.reserve_expires_at.is_not(None),
+        _pending_deadline(Circuit.reserve_expires_at, Circuit.id, today),
+    )
+    subs = select(SubCircuit.reserve_expires_at, SubCircuit.circuit_id).where(
+        SubCircuit.status.in_(RESERVE_STATUSES),
+        SubCircuit.reserve_expires_at.is_not(None),
+        _pending_deadline(SubCircuit.reserve_expires_at, SubCircuit.circuit_id, today),
+    )
+    # Una extension vencida deja a su propia notificacion inactiva: se encola para reemplazarla
+    extensions = select(Notification.extended_until, Notification.circuit_id).where(
+        Notification.type == "reserve_no_contact",
+        Notification.is_dismissed == false(),
+        Notification.extended_until.is_not(None),
+        Notification.circuit_id.is_not(None),
+    )
+    return union_all(circuits, subs, extensions)
+
+
+class ReserveExpiryScheduler:
+    """
+    Planificador de vencimientos de reservas: un min-heap de (fecha, circuit_id)
+    con el proximo vencimiento de cada reserva o extension. Un hilo duerme hasta
+    el primero (a RESERVE_CHECK_HOUR) y revisa solo los circuitos vencidos.
+    Las entradas obsoletas (reserva eliminada o extendida) no se quitan del heap:
+    al dispararse, check_expiring_reserves no encuentra nada que notificar.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[date, int]] = []
+        self._queued: set[tuple[date, int]] = set()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.rebuild()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="reserve-expiry", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+
+    def rebuild(self) -> int:
+        """
+        Recarga el heap desde la BD (al iniciar y como red de seguridad diaria) con
+        los vencimientos futuros y los pasados aun sin notificar. Retorna su tamaño.
+        """
+        db = SessionLocal()
+        try:
+            rows = db.execute(_deadlines_query()).all()
+        finally:
+            db.close()
+        # Los vencidos sin notificar se revisan a la hora de hoy (o de inmediato si ya paso)
+        today = date.today()
+        entries = {(max(deadline, today), circuit_id) for deadline, circuit_id in rows}
+        with self._cond:
+            self._heap = list(entries)
+            heapq.heapify(self._heap)
+            self._queued = entries
+            self._cond.notify()
+        return len(entries)
+
+    def push(self, entries) -> None:
+        with self._cond:
+            added = False
+            for entry in entries:
+                if entry not in self._queued:
+                    heapq.heappush(self._heap, entry)
+                    self._queued.add(entry)
+                    added = True
+            if added:
+                self._cond.notify()
+
+    def push_notification(self, payload: str) -> None:
+        """Handler del canal RESERVE_DEADLINES_CHANNEL: [[fecha ISO, circuit_id], ...]."""
+        self.push((date.fromisoformat(deadline), circuit_id) for deadline, circuit_id in json.loads(payload))
+
+    def _pop_due(self) -> list[int] | None:
+        """Espera hasta que haya entradas vencidas y las retorna (None al detenerse)."""
+        with self._cond:
+            while not self._stopping:
+                if self._heap:
+                    wait = (_due_at(self._heap[0][0]) - datetime.now()).total_seconds()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(min(wait, _MAX_WAIT_S))
+                else:
+                    self._cond.wait(_MAX_WAIT_S)
+            if self._stopping:
+                return None
+            now = datetime.now()
+            circuit_ids = set()
+            while self._heap and _due_at(self._heap[0][0]) <= now:
+                entry = heapq.heappop(self._heap)
+                self._queued.discard(entry)
+                circuit_ids.add(entry[1])
+            return sorted(circuit_ids)
+
+    def _run(self) -> None:
+        while True:
+            circuit_ids = self._pop_due()
+            if circuit_ids is None:
+                return
+            db = SessionLocal()
+            try:
+                with job_registry.track("reserve_expiry") as stats:
+                    created = check_expiring_reserves(db, circuit_ids)
+                    stats.update(rows_scanned=len(circuit_ids), rows_inserted=created)
+                if created:
+                    print(f"[RESERVE EXPIRY] {created} notificacion(es) para {len(circuit_ids)} circuito(s)")
+            except Exception as e:
+                db.rollback()
+                print(f"[RESERVE EXPIRY] Error al revisar circuitos {circuit_ids}: {e}")
+            finally:
+                db.close()
+
+
+reserve_scheduler = ReserveExpiryScheduler()
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_deadlines(session: Session, flush_context) -> None:
+    """Registra los vencimientos de reservas y extensiones escritos en el flush."""
+    pending = session.info.setdefault(_PENDING_DEADLINES, set())
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, Circuit):
+            if obj.status in RESERVE_STATUSES and obj.reserve_expires_at:
+                pending.add((obj.reserve_expires_at, obj.id))
+        elif isinstance(obj, SubCircuit):
+            if obj.status in RESERVE_STATUSES and obj.reserve_expires_at and obj.circuit_id:
+                pending.add((obj.reserve_expires_at, obj.circuit_id))
+        elif isinstance(obj, Notification):
+            if (
+                obj.type == "reserve_no_contact" and not obj.is_dismissed
+                and obj.extended_until and obj.circuit_id
+            ):
+                pending.add((obj.extended_until, obj.circuit_id))
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _notify_deadlines(session: Session) -> None:
+    """
+    Si el planificador corre en otro proceso, le envia los vencimientos con
+    pg_notify en la misma transaccion (PostgreSQL solo los entrega si confirma).
+    """
+    if reserve_scheduler.running:
+        return
+    session.flush()
+    pending = sorted(session.info.pop(_PENDING_DEADLINES, ()))
+    for i in range(0, len(pending), _NOTIFY_CHUNK):
+        payload = json.dumps([[d.isoformat(), c] for d, c in pending[i:i + _NOTIFY_CHUNK]])
+        session.execute(select(func.pg_notify(RESERVE_DEADLINES_CHANNEL, payload)))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_deadlines(session: Session) -> None:
+    pending = session.info.pop(_PENDING_DEADLINES, None)
+    if pending and reserve_scheduler.running:
+        reserve_scheduler.push(pending)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_deadlines(session: Session, previous_transaction) -> None:
+    # Un SAVEPOINT revertido no descarta lo acumulado por el resto de la transaccion
+    if previous_transaction.nested:
+        return
+    session.info.pop(_PENDING_DEADLINES, None)
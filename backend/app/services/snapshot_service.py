@@ -0,0 +1,96 @@
+from datetime import date
+
+from sqlalchemy import select, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.station import Station
+from app.models.station_demand_snapshot import StationDemandSnapshot
+from app.services.report_cache import bump_data_version
+
+
+def take_snapshot(
+    db: Session,
+    station_ids: list[int] | None = None,
+    snapshot_date: date | None = None,
+) -> int:
+    """
+    Guarda (o actualiza) la foto del dia de la demanda de las estaciones con un
+    unico INSERT ... SELECT ... ON CONFLICT. No confirma la transaccion.
+    Los reportes de demanda leen estas fotos, por lo que tambien invalida el cache
+    de reportes. Retorna cuantas filas se escribieron.
+    """
+    snapshot_date = snapshot_date or date.today()
+    source = select(
+        Station.id,
+        literal(snapshot_date),
+        Station.transformer_capacity_kw,
+        Station.max_demand_kw,
+        Station.available_power_kw,
+        Station.status,
+    )
+    if station_ids is not None:
+        source = source.where(Station.id.in_(station_ids))
+
+    stmt = insert(StationDemandSnapshot).from_select(
+        [
+            "station_id",
+            "snapshot_date",
+            "transformer_capacity_kw",
+            "max_demand_kw",
+            "available_power_kw",
+            "status",
+        ],
+        source,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["station_id", "snapshot_date"],
+        set_={
+            "transformer_capacity_kw": stmt.excluded.transformer_capacity_kw,
+            "max_demand_kw": stmt.excluded.max_demand_kw,
+            "available_power_kw": stmt.excluded.available_power_kw,
+            "status": stmt.excluded.status,
+        },
+    )
+    written = db.execute(stmt).rowcount
+    bump_data_version(db)
+    return written
+
+
+def demand_history(
+    db: Session,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    station_id: int | None = None,
+) -> list[dict]:
+    """Serie diaria de demanda por estacion leida de station_demand_snapshots."""
+    query = (
+        db.query(StationDemandSnapshot, Station.name, Station.code)
+        .join(Station, Station.id == StationDemandSnapshot.station_id)
+    )
+    if start_date:
+        query = query.filter(StationDemandSnapshot.snapshot_date >= start_date)
+    if end_date:
+        query = query.filter(StationDemandSnapshot.snapshot_date <= end_date)
+    if station_id:
+        query = query.filter(StationDemandSnapshot.station_id == station_id)
+
+    rows = query.order_by(Station.order_index, StationDemandSnapshot.snapshot_date).all()
+
+    data: dict[int, dict] = {}
+    for snap, name, code in rows:
+        if snap.station_id not in data:
+            data[snap.station_id] = {
+                "station_id": snap.station_id,
+                "station_name": name,
+                "station_code": code,
+                "series": [],
+            }
+        data[snap.station_id]["series"].append({
+            "date": snap.snapshot_date.isoformat(),
+            "transformer_capacity_kw": float(snap.transformer_capacity_kw),
+            "max_demand_kw": float(snap.max_demand_kw),
+            "available_power_kw": float(snap.available_power_kw),
+            "status": snap.status,
+        })
+    return list(data.values())
@@ -0,0 +1,194 @@
+import heapq
+from datetime import datetime
+
+from sqlalchemy import select, or_, and_, cast, Integer
+from sqlalchemy.orm import Session
+
+from app.models.bar import Bar
+from app.models.circuit import Circuit
+from app.models.sub_circuit import SubCircuit
+from app.models.audit_log import AuditLog
+from app.models.observation import Observation
+from app.models.notification import Notification
+from app.models.request import Request
+from app.models.user import User
+
+
+def _before(ts_col, id_col, source: str, cursor: tuple[datetime, str, int] | None):
+    """
+    Condicion keyset (ts, source, id) < cursor para una fuente. El nombre de la
+    fuente desempata eventos con la misma fecha; como es constante en cada
+    consulta, la condicion se reduce a una comparacion sobre (ts, id).
+    """
+    if cursor is None:
+        return None
+    c_ts, c_source, c_id = cursor
+    if source < c_source:
+        return ts_col <= c_ts
+    if source > c_source:
+        return ts_col < c_ts
+    return or_(ts_col < c_ts, and_(ts_col == c_ts, id_col < c_id))
+
+
+def _page(db: Session, stmt, ts_col, id_col, source: str, cursor, limit: int):
+    condition = _before(ts_col, id_col, source, cursor)
+    if condition is not None:
+        stmt = stmt.where(condition)
+    return db.execute(stmt.order_by(ts_col.desc(), id_col.desc()).limit(limit)).all()
+
+
+def _audit_events(db: Session, station_id: int, cursor, limit: int) -> list[dict]:
+    # Dos ramas ordenadas, cada una sobre su indice (ix_audit_logs_entity e
+    # ix_audit_logs_details_station), en lugar de un OR que no usa ninguno
+    columns = select(
+        AuditLog.id, AuditLog.action_date, AuditLog.action, AuditLog.entity_type,
+        AuditLog.entity_id, AuditLog.user_name, AuditLog.details,
+    )
+    by_entity = _page(
+        db,
+        columns.where(AuditLog.entity_type == "station", AuditLog.entity_id == station_id),
+        AuditLog.action_date, AuditLog.id, "audit", cursor, limit,
+    )
+    by_details = _page(
+        db,
+        columns.where(cast(AuditLog.details["station_id"].astext, Integer) == station_id),
+        AuditLog.action_date, AuditLog.id, "audit", cursor, limit,
+    )
+    # Mezcla descendente; una fila que cumple ambas condiciones aparece una sola vez
+    rows, seen = [], set()
+    for r in heapq.merge(by_entity, by_details, key=lambda r: (r.action_date, r.id), reverse=True):
+        if r.id in seen:
+            continue
+        seen.add(r.id)
+        rows.append(r)
+        if len(rows) == limit:
+            break
+    return [
+        {
+            "source": "audit",
+            "id": r.id,
+            "occurred_at": r.action_date,
+            "kind": r.action,
+            "summary": f"{r.entity_type} #{r.entity_id}" if r.entity_id else r.entity_type,
+            "user_name": r.user_name,
+            "details": r.details,
+        }
+        for r in rows
+    ]
+
+
+def _notification_events(db: Session, station_id: int, cursor, limit: int) -> list[dict]:
+    rows = _page(
+        db,
+        select(
+            Notification.id, Notification.created_at, Notification.type,
+            Notification.message, Notification.circuit_id, Notification.is_read,
+        ).where(Notification.station_id == station_id),
+        Notification.created_at, Notification.id, "notification", cursor, limit,
+    )
+    return [
+        {
+            "source": "notification",
+            "id": r.id,
+            "occurred_at": r.created_at,
+            "kind": r.type,
+            "summary": r.message,
+            "user_name": None,
+            "details": {"circuit_id": r.circuit_id, "is_read": r.is_read},
+        }
+        for r in rows
+    ]
+
+
+def _observation_events(db: Session, station_id: int, cursor, limit: int) -> list[dict]:
+    # Las observaciones cuelgan de una barra, circuito o sub-circuito de la estacion
+    bar_ids = select(Bar.id).where(Bar.station_id == station_id)
+    circuit_ids = select(Circuit.id).where(Circuit.bar_id.in_(bar_ids))
+    sub_ids = select(SubCircuit.id).where(SubCircuit.circuit_id.in_(circuit_ids))
+    rows = _page(
+        db,
+        select(
+            Observation.id, Observation.created_at, Observation.severity, Observation.content,
+            Observation.bar_id, Observation.circuit_id, Observation.sub_circuit_id,
+            User.full_name,
+        )
+        .join(User, Observation.user_id == User.id)
+        .where(or_(
+            Observation.bar_id.in_(bar_ids),
+            Observation.circuit_id.in_(circuit_ids),
+            Observation.sub_circuit_id.in_(sub_ids),
+        )),
+        Observation.created_at, Observation.id, "observation", cursor, limit,
+    )
+    return [
+        {
+            "source": "observation",
+            "id": r.id,
+            "occurred_at": r.created_at,
+            "kind": r.severity,
+            "summary": r.content,
+            "user_name": r.full_name,
+            "details": {
+                "bar_id": r.bar_id,
+                "circuit_id": r.circuit_id,
+                "sub_circuit_id": r.sub_circuit_id,
+            },
+        }
+        for r in rows
+    ]
+
+
+def _request_events(db: Session, station_id: int, cursor, limit: int) -> list[dict]:
+    rows = _page(
+        db,
+        select(
+            Request.id, Request.created_at, Request.status, Request.bar_type,
+            Request.requested_load_kw, Request.circuit_id, User.full_name,
+        )
+        .join(User, Request.opersac_user_id == User.id)
+        .where(Request.station_id == station_id),
+        Request.created_at, Request.id, "request", cursor, limit,
+    )
+    return [
+        {
+            "source": "request",
+            "id": r.id,
+            "occurred_at": r.created_at,
+            "kind": f"request_{r.status}",
+            "summary": f"Solicitud de {float(r.requested_load_kw)} kW en barra {r.bar_type}",
+            "user_name": r.full_name,
+            "details": {
+                "status": r.status,
+                "bar_type": r.bar_type,
+                "circuit_id": r.circuit_id,
+                "requested_load_kw": float(r.requested_load_kw),
+            },
+        }
+        for r in rows
+    ]
+
+
+def station_timeline(
+    db: Session,
+    station_id: int,
+    cursor: tuple[datetime, str, int] | None,
+    limit: int,
+) -> tuple[list[dict], tuple[datetime, str, int] | None]:
+    """
+    Historial de la estacion: auditoria, notificaciones, observaciones y solicitudes
+    en orden (fecha, fuente, id) descendente. Cada fuente aporta como maximo
+    limit + 1 filas por keyset y se combinan con una mezcla k-way.
+    Retorna los eventos de la pagina y la clave del cursor siguiente (o None).
+    """
+    sources = [
+        _audit_events(db, station_id, cursor, limit + 1),
+        _notification_events(db, station_id, cursor, limit + 1),
+        _observation_events(db, station_id, cursor, limit + 1),
+        _request_events(db, station_id, cursor, limit + 1),
+    ]
+    key = lambda e: (e["occurred_at"], e["source"], e["id"])  # noqa: E731
+    merged = list(heapq.merge(*sources, key=key, reverse=True))[: limit + 1]
+
+    items = merged[:limit]
+    next_key = key(items[-1]) if len(merged) > limit else None
+    return items, next_key
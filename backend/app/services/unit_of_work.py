@@ -0,0 +1,111 @@
+from itertools import chain
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.station import Station
+from app.models.bar import Bar
+from app.models.circuit import Circuit
+from app.models.sub_circuit import SubCircuit
+from app.models.request import Request
+
+# Claves en session.info donde se acumula el estado de la unidad de trabajo
+_DIRTY_BARS = "uow_dirty_bar_ids"
+_DIRTY_CIRCUITS = "uow_dirty_circuit_ids"
+_ACCOUNTED = "uow_accounted_station_ids"
+_RECALCULATED = "uow_recalculated_station_ids"
+_REPORT_DATA_CHANGED = "uow_report_data_changed"
+_ALL_STATIONS = "all"
+
+
+def mark_station_accounted(db: Session, station_id: int) -> None:
+    """Indica que la demanda de la estacion ya se ajusto (delta) en esta transaccion."""
+    db.info.setdefault(_ACCOUNTED, set()).add(station_id)
+    mark_stations_recalculated(db, [station_id])
+
+
+def mark_stations_recalculated(db: Session, station_ids: list[int] | None) -> None:
+    """Registra estaciones cuya demanda cambio en esta transaccion (None = todas)."""
+    if station_ids is None or db.info.get(_RECALCULATED) == _ALL_STATIONS:
+        db.info[_RECALCULATED] = _ALL_STATIONS
+    else:
+        db.info.setdefault(_RECALCULATED, set()).update(station_ids)
+
+
+def _clear(session: Session) -> None:
+    for key in (_DIRTY_BARS, _DIRTY_CIRCUITS, _ACCOUNTED, _RECALCULATED, _REPORT_DATA_CHANGED):
+        session.info.pop(key, None)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _track_dirty_stations(session: Session, flush_context) -> None:
+    """Registra las barras/circuitos afectados por cambios en Circuit y SubCircuit."""
+    bar_ids = session.info.setdefault(_DIRTY_BARS, set())
+    circuit_ids = session.info.setdefault(_DIRTY_CIRCUITS, set())
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (Station, Bar, Circuit, SubCircuit, Request)):
+            session.info[_REPORT_DATA_CHANGED] = True
+        if isinstance(obj, Circuit):
+            bar_ids.add(obj.bar_id)
+            # Si el circuito cambio de barra, la estacion anterior tambien queda sucia
+            bar_ids.update(inspect(obj).attrs.bar_id.history.deleted or ())
+        elif isinstance(obj, SubCircuit):
+            circuit_ids.add(obj.circuit_id)
+            circuit_ids.update(inspect(obj).attrs.circuit_id.history.deleted or ())
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _recalculate_dirty_stations(session: Session) -> None:
+    """
+    Antes del commit recalcula una sola vez cada estacion sucia, en la misma
+    transaccion. Las estaciones ya ajustadas con apply_delta no se recalculan.
+    """
+    session.flush()
+
+    bar_ids = {b for b in session.info.pop(_DIRTY_BARS, set()) if b is not None}
+    circuit_ids = {c for c in session.info.pop(_DIRTY_CIRCUITS, set()) if c is not None}
+    accounted = session.info.pop(_ACCOUNTED, set())
+
+    station_ids: set[int] = set()
+    if bar_ids:
+        station_ids.update(
+            session.scalars(select(Bar.station_id).where(Bar.id.in_(bar_ids)))
+        )
+    if circuit_ids:
+        station_ids.update(
+            session.scalars(
+                select(Bar.station_id)
+                .join(Circuit, Circuit.bar_id == Bar.id)
+                .where(Circuit.id.in_(circuit_ids))
+            )
+        )
+
+    station_ids -= accounted
+    if station_ids:
+        from app.services.energy_calculator import EnergyCalculator
+
+        EnergyCalculator(session).update_demand(sorted(station_ids))
+
+    # Foto del dia de las estaciones recalculadas (opcional, ver SNAPSHOT_ON_RECALCULATION)
+    recalculated = session.info.pop(_RECALCULATED, None)
+    if recalculated and settings.SNAPSHOT_ON_RECALCULATION:
+        from app.services.snapshot_service import take_snapshot
+
+        take_snapshot(session, None if recalculated == _ALL_STATIONS else sorted(recalculated))
+
+    # Cualquier cambio en datos de reportes invalida el cache de reportes
+    if session.info.pop(_REPORT_DATA_CHANGED, False) or recalculated:
+        from app.services.report_cache import bump_data_version
+
+        bump_data_version(session)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_dirty_stations(session: Session, previous_transaction) -> None:
+    # Un SAVEPOINT revertido no descarta lo acumulado por el resto de la transaccion
+    if previous_transaction.nested:
+        return
+    _clear(session)
@@ -33,6 +33,10 @@ BAR_TYPES = [
     {"name": "Barra Continuidad", "bar_type": "continuity"},
 ]
 
+# Conversion kW → A para verificar capacity_a de las barras (trifasico)
+BAR_NOMINAL_VOLTAGE_V = 380
+BAR_POWER_FACTOR = 0.9
+
 PERMISSION_FEATURES = [
     "view_stations",
     "view_circuits",
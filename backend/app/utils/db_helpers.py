@@ -17,3 +17,18 @@ def safe_commit(db: Session, user_msg: str = "Error al guardar los datos") -> No
     except OperationalError:
         db.rollback()
         raise HTTPException(status_code=503, detail="Error de conexion con la base de datos")
+
+
+def safe_flush(db: Session, user_msg: str = "Error al guardar los datos") -> None:
+    """
+    Igual que safe_commit pero con db.flush(): envia los cambios pendientes
+    (p. ej. para obtener ids) sin confirmar la transaccion.
+    """
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=user_msg)
+    except OperationalError:
+        db.rollback()
+        raise HTTPException(status_code=503, detail="Error de conexion con la base de datos")
@@ -0,0 +1,47 @@
+import tempfile
+from typing import BinaryIO, Iterator
+
+from fastapi.responses import StreamingResponse
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Tamano de lectura del archivo temporal y de lote de filas leidas de la BD
+CHUNK_SIZE = 64 * 1024
+ROWS_PER_BATCH = 2000
+
+
+def write_only_workbook():
+    """Workbook de openpyxl en modo write-only: las filas se escriben a disco al agregarlas."""
+    from openpyxl import Workbook
+
+    return Workbook(write_only=True)
+
+
+def spool_workbook(wb) -> BinaryIO:
+    """Guarda el workbook en un archivo temporal (se borra al cerrarlo) listo para leer."""
+    tmp = tempfile.TemporaryFile()
+    try:
+        wb.save(tmp)
+    except Exception:
+        tmp.close()
+        raise
+    tmp.seek(0)
+    return tmp
+
+
+def iter_file(f: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Lee el archivo por bloques y lo cierra al terminar (o si el cliente corta)."""
+    try:
+        while chunk := f.read(chunk_size):
+            yield chunk
+    finally:
+        f.close()
+
+
+def xlsx_response(wb, filename: str) -> StreamingResponse:
+    """Respuesta que transmite el workbook desde un archivo temporal, por bloques."""
+    return StreamingResponse(
+        iter_file(spool_workbook(wb)),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from app.database import SessionLocal
+from app.utils.excel_stream import ROWS_PER_BATCH
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None:
+        return ""
+    return value
+
+
+def _encode(rows, columns: list[str], fmt: str) -> bytes:
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        writer.writerows([_csv_value(v) for v in row] for row in rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps(
+                {c: _json_value(v) for c, v in zip(columns, row)}, ensure_ascii=False
+            ))
+            buffer.write("\n")
+    return buffer.getvalue().encode("utf-8")
+
+
+def stream_query(stmt: Select, columns: list[str], fmt: str) -> Iterator[bytes]:
+    """
+    Ejecuta stmt con un cursor del servidor y emite las filas en CSV o NDJSON por
+    lotes. Abre su propia sesion: la de la dependencia get_db se cierra antes de
+    que termine la respuesta.
+    """
+    db = SessionLocal()
+    try:
+        if fmt == "csv":
+            header = io.StringIO()
+            csv.writer(header).writerow(columns)
+            yield header.getvalue().encode("utf-8")
+
+        result = db.execute(
+            stmt.execution_options(stream_results=True, yield_per=ROWS_PER_BATCH)
+        )
+        for rows in result.partitions():
+            yield _encode(rows, columns, fmt)
+    finally:
+        db.close()
+
+
+def export_response(stmt: Select, columns: list[str], fmt: str, basename: str) -> StreamingResponse:
+    """StreamingResponse en CSV o NDJSON; formato invalido → 400 antes de empezar a transmitir."""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato invalido: {fmt}. Use csv o ndjson")
+    return StreamingResponse(
+        stream_query(stmt, columns, fmt),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename={basename}.{fmt}"},
+    )